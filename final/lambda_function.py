@@ -6,30 +6,151 @@
 # implementing slots, dialog management,
 # session persistence, api calls, and more.
 
-import requests
+import os
 import logging
-import calendar
 from datetime import datetime
-from pytz import timezone
 
-from ask_sdk_s3.adapter import S3Adapter
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
 from ask_sdk_core.skill_builder import CustomSkillBuilder
 from ask_sdk_core.dispatch_components import (
     AbstractRequestHandler, AbstractExceptionHandler
 )
 from ask_sdk_core.utils import is_request_type, is_intent_name
+from ask_sdk_runtime.dispatch_components.request_components import (
+    AbstractRequestMapper
+)
+
+# requests, pytz, calendar and the S3 adapter (with boto3) are imported the
+# first time a handler needs them, so Help, Stop and SessionEnded requests
+# don't pay for them on a cold start
+
+
+class LazyS3Adapter(AbstractPersistenceAdapter):
+    """
+    Creates the S3Adapter the first time persistent attributes are used
+    """
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+        self._adapter = None
+
+    @property
+    def adapter(self):
+        if self._adapter is None:
+            from ask_sdk_s3.adapter import S3Adapter
+            self._adapter = S3Adapter(bucket_name=self.bucket_name)
+        return self._adapter
+
+    def get_attributes(self, request_envelope):
+        return self.adapter.get_attributes(request_envelope=request_envelope)
+
+    def save_attributes(self, request_envelope, attributes):
+        self.adapter.save_attributes(
+            request_envelope=request_envelope, attributes=attributes)
 
-s3_adapter = S3Adapter(bucket_name="custom-walk-testing")
-sb = CustomSkillBuilder(persistence_adapter=s3_adapter)
+    def delete_attributes(self, request_envelope):
+        self.adapter.delete_attributes(request_envelope=request_envelope)
+
+
+def may_handle(handler, request_type, intent_name):
+    """
+    Whether a handler's request_types / intent_names declarations allow
+    this request. Handlers that declare nothing may handle anything.
+    """
+    types = getattr(handler, "request_types", None)
+    intents = getattr(handler, "intent_names", None)
+    if types is None and intents is not None:
+        types = ("IntentRequest",)
+    return (types is None or request_type in types) and \
+        (intents is None or intent_name in intents)
+
+
+class IndexedRequestMapper(AbstractRequestMapper):
+    """
+    Only asks the handlers declared for the request's type and intent
+    name, in registration order, instead of every handler in turn. So
+    HasBirthdayLaunchRequestHandler, which loads the persistent
+    attributes, is only asked about LaunchRequests
+    """
+    def __init__(self, request_handler_chains):
+        self.request_handler_chains = list(request_handler_chains)
+        self.index = {}
+
+    def get_request_handler_chain(self, handler_input):
+        request = handler_input.request_envelope.request
+        intent_name = None
+        if request.object_type == "IntentRequest":
+            intent_name = request.intent.name
+        key = (request.object_type, intent_name)
+        chains = self.index.get(key)
+        if chains is None:
+            chains = self.index[key] = [
+                chain for chain in self.request_handler_chains
+                if may_handle(chain.request_handler, *key)]
+        for chain in chains:
+            if chain.request_handler.can_handle(handler_input=handler_input):
+                return chain
+        return None
+
+
+class IndexedSkillBuilder(CustomSkillBuilder):
+    """
+    CustomSkillBuilder that dispatches through an IndexedRequestMapper,
+    built once and kept across warm invocations
+    """
+    request_mapper = None
+
+    @property
+    def skill_configuration(self):
+        skill_config = super(IndexedSkillBuilder, self).skill_configuration
+        chains = self.runtime_configuration_builder.request_handler_chains
+        if self.request_mapper is None or \
+                self.request_mapper.request_handler_chains != chains:
+            self.request_mapper = IndexedRequestMapper(chains)
+        skill_config.request_mappers = [self.request_mapper]
+        return skill_config
+
+
+s3_adapter = LazyS3Adapter(bucket_name="custom-walk-testing")
+sb = IndexedSkillBuilder(persistence_adapter=s3_adapter)
 
 logger = logging.getLogger("main")
 logger.setLevel(logging.INFO)
 
+# (connect, read) timeouts in seconds for Alexa Settings API calls
+SETTINGS_API_TIMEOUT = (
+    float(os.environ.get("SETTINGS_API_CONNECT_TIMEOUT", "1.0")),
+    float(os.environ.get("SETTINGS_API_READ_TIMEOUT", "2.0")),
+)
+
+# shared session so TCP/TLS connections to the Alexa API are kept alive
+# across warm invocations, with retries and backoff for transient failures
+http_session = None
+
+
+def get_http_session():
+    global http_session
+    if http_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        http_session = requests.Session()
+        http_session.mount("https://", HTTPAdapter(
+            pool_connections=4, pool_maxsize=10,
+            max_retries=Retry(
+                total=int(os.environ.get("SETTINGS_API_RETRIES", "2")),
+                backoff_factor=float(
+                    os.environ.get("SETTINGS_API_BACKOFF", "0.1")),
+                status_forcelist=(429, 500, 502, 503, 504))))
+    return http_session
+
 
 class LaunchRequestIntentHandler(AbstractRequestHandler):
     """
     Handler for Skill Launch
     """
+    request_types = ("LaunchRequest",)
+
     def can_handle(self, handler_input):
         return is_request_type("LaunchRequest")(handler_input)
 
@@ -45,6 +166,8 @@ class HasBirthdayLaunchRequestHandler(AbstractRequestHandler):
     """
     Handler for launch after they have set their birthday
     """
+    request_types = ("LaunchRequest",)
+
     def can_handle(self, handler_input):
         # extract persistent attributes and check if they are all present
         attr = handler_input.attributes_manager.persistent_attributes
@@ -73,7 +196,8 @@ class HasBirthdayLaunchRequestHandler(AbstractRequestHandler):
 
         userTimeZone = ""
         try:
-            r = requests.get(url, headers=headers)
+            r = get_http_session().get(url, headers=headers, timeout=SETTINGS_API_TIMEOUT)
+            r.raise_for_status()
             res = r.json()
             logger.info("Device API result: {}".format(str(res)))
             userTimeZone = res
@@ -81,6 +205,9 @@ class HasBirthdayLaunchRequestHandler(AbstractRequestHandler):
             handler_input.response_builder.speak("There was a problem connecting to the service")
             return handler_input.response_builder.response
 
+        import calendar
+        from pytz import timezone
+
         # getting the current date with the time
         now_time = datetime.now(timezone(userTimeZone))
         
@@ -121,6 +248,8 @@ class BirthdayIntentHandler(AbstractRequestHandler):
     """
     Handler for Capturing the Birthday
     """
+    intent_names = ("CaptureBirthdayIntent",)
+
     def can_handle(self, handler_input):
         return is_intent_name("CaptureBirthdayIntent")(handler_input)
 
@@ -152,6 +281,8 @@ class HelpIntentHandler(AbstractRequestHandler):
     """
     Handler for AMAZON.HelpIntent
     """
+    intent_names = ("AMAZON.HelpIntent",)
+
     def can_handle(self, handler_input):
         return is_intent_name("AMAZON.HelpIntent")(handler_input)
 
@@ -183,9 +314,11 @@ class CancelAndStopIntentHandler(AbstractRequestHandler):
     """
     Handler for AMAZON.CancelIntent and AMAZON.StopIntent
     """
+    intent_names = ("AMAZON.CancelIntent", "AMAZON.StopIntent")
+
     def can_handle(self, handler_input):
         return is_intent_name("AMAZON.CancelIntent")(handler_input) \
-            and is_intent_name("AMAZON.StopIntent")(handler_input)
+            or is_intent_name("AMAZON.StopIntent")(handler_input)
 
     def handle(self, handler_input):
         speak_output = "Goodbye!"
@@ -197,6 +330,8 @@ class SessionEndedRequestHandler(AbstractRequestHandler):
     """
     Handler for SessionEndedRequest
     """
+    request_types = ("SessionEndedRequest",)
+
     def can_handle(self, handler_input):
         return is_request_type("SessionEndedRequest")(handler_input)
 
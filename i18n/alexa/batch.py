@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# Vectorized birthday countdowns for offline jobs over the whole user base
+# (nightly "whose birthday is today" notifications, countdown histograms).
+#
+# Same semantics as alexa.countdown.days_until_birthday, including Feb 29
+# birthdays falling on Feb 28 in non-leap years, but over NumPy columns.
+# NumPy is only needed by these jobs, it is not part of the Lambda
+# package requirements.
+
+import time
+
+import numpy as np
+
+from alexa.countdown import _DAYS_BEFORE, _DAYS_IN_MONTH
+
+_DAYS_BEFORE_TABLE = np.array(_DAYS_BEFORE, dtype=np.int32)
+_DAYS_IN_MONTH_TABLE = np.array(_DAYS_IN_MONTH, dtype=np.int32)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def _is_leap(year):
+    return (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+
+
+def _day_of_year(year, month, day):
+    leap = _is_leap(year)
+    day = np.where((month == 2) & (day == 29) & ~leap, 28, day)
+    return _DAYS_BEFORE_TABLE[leap.astype(np.intp), month] + day
+
+
+def local_dates(utc_offset, now=None):
+    """
+    Return (year, day_of_year) arrays for today's local date, given each
+    user's UTC offset in seconds.
+    """
+    now = time.time() if now is None else now
+    local_days = np.floor_divide(
+        np.asarray(utc_offset, dtype=np.int64) + int(now), SECONDS_PER_DAY)
+    dates = local_days.astype('datetime64[D]')
+    years = dates.astype('datetime64[Y]')
+    year = years.astype(np.int32) + 1970
+    day_of_year = (dates - years.astype('datetime64[D]')).astype(np.int32) + 1
+    return year, day_of_year
+
+
+def days_until_birthday(year, month, day, utc_offset, now=None):
+    """
+    Return (days, age) arrays for columns of birth year, month (1-12),
+    day and UTC offset in seconds. days is 0 on the birthday, age is the
+    age turned on the next birthday. Raises ValueError on invalid dates.
+    """
+    year = np.asarray(year, dtype=np.int32)
+    month = np.asarray(month, dtype=np.intp)
+    day = np.asarray(day, dtype=np.int32)
+
+    if ((month < 1) | (month > 12)).any():
+        raise ValueError('invalid month in batch')
+    if ((day < 1) | (day > _DAYS_IN_MONTH_TABLE[month])).any():
+        raise ValueError('invalid day in batch')
+
+    today_year, today = local_dates(utc_offset, now)
+    this_year = _day_of_year(today_year, month, day)
+    passed = this_year < today
+
+    next_year = _day_of_year(today_year + 1, month, day)
+    year_length = 365 + _is_leap(today_year)
+    days = np.where(passed, year_length - today + next_year, this_year - today)
+    age = today_year - year + passed
+    return days, age
+
+
+def birthdays_today(year, month, day, utc_offset, now=None):
+    """
+    Return a boolean mask of the users whose birthday is today in their
+    own time zone.
+    """
+    days, _ = days_until_birthday(year, month, day, utc_offset, now)
+    return days == 0
+
+
+def countdown_histogram(year, month, day, utc_offset, now=None):
+    """
+    Return an array where index n is the number of users with n days
+    left until their birthday.
+    """
+    days, _ = days_until_birthday(year, month, day, utc_offset, now)
+    return np.bincount(days, minlength=366)
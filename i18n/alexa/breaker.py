@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("main")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of calling through an open breaker.
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Stops calling a dependency that keeps failing or answering slowly.
+
+    The outcomes of the last window calls are kept; once at least
+    min_calls of them are in and failure_rate of them failed (raised,
+    or took longer than slow_call_ms) the breaker opens, and calls fail
+    with CircuitOpen without waiting on the dependency. After
+    open_seconds one trial call is let through (half open): success
+    closes the breaker, failure opens it again.
+
+    Exceptions in excluded don't count either way, e.g. a call given up
+    because the request ran out of time says nothing about the
+    dependency. on_transition(breaker, old_state, new_state) is called
+    on every state change.
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_calls=5, window=20,
+                 slow_call_ms=1500, open_seconds=30, excluded=(),
+                 on_transition=None, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_ms = slow_call_ms
+        self.open_seconds = open_seconds
+        self.excluded = tuple(excluded)
+        self.on_transition = on_transition
+        self.clock = clock
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.transitions = 0
+
+    def call(self, func, *args, **kwargs):
+        """
+        Return func(*args, **kwargs), or raise CircuitOpen while the
+        breaker is open.
+        """
+        transition = None
+        with self._lock:
+            if self.state == OPEN and \
+                    self.clock() - self._opened_at >= self.open_seconds:
+                transition = self._set_state(HALF_OPEN)
+            if self.state == OPEN or (self.state == HALF_OPEN and self._trial):
+                self.rejected += 1
+                rejected = True
+            else:
+                rejected = False
+                # only this call's own outcome may end the half-open state
+                trial = self._trial = self.state == HALF_OPEN
+                self.calls += 1
+        self._notify(transition)
+        if rejected:
+            raise CircuitOpen("{} circuit is open".format(self.name))
+
+        start = self.clock()
+        try:
+            result = func(*args, **kwargs)
+        except self.excluded:
+            self._record(None, trial)
+            raise
+        except Exception:
+            self._record(True, trial)
+            raise
+        elapsed_ms = (self.clock() - start) * 1000
+        self._record(elapsed_ms > self.slow_call_ms, trial)
+        return result
+
+    def wrap(self, func):
+        """
+        Return func called through the breaker.
+        """
+        def guarded(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return guarded
+
+    def _record(self, failed, trial=False):
+        """
+        Record a call's outcome: True if it failed, None if it doesn't
+        count. trial is whether it was the half-open trial call; calls
+        admitted before the breaker opened don't decide the trial.
+        """
+        transition = None
+        with self._lock:
+            if trial:
+                self._trial = False
+            if failed is None:
+                return
+            if failed:
+                self.failures += 1
+            if trial:
+                if self.state == HALF_OPEN:
+                    transition = self._set_state(OPEN if failed else CLOSED)
+            elif self.state == CLOSED:
+                self._outcomes.append(failed)
+                if self._tripped():
+                    transition = self._set_state(OPEN)
+        self._notify(transition)
+
+    def _tripped(self):
+        outcomes = self._outcomes
+        return len(outcomes) >= self.min_calls and \
+            sum(outcomes) >= self.failure_rate * len(outcomes)
+
+    def _set_state(self, state):
+        """
+        Change state, with the lock held. Returns (old, new) for _notify.
+        """
+        old, self.state = self.state, state
+        if state == OPEN:
+            self._opened_at = self.clock()
+        elif state == CLOSED:
+            self._outcomes.clear()
+        self.transitions += 1
+        return old, state
+
+    def _notify(self, transition):
+        if transition is None:
+            return
+        old, new = transition
+        logger.warning("Circuit {} {} -> {}".format(self.name, old, new))
+        if self.on_transition is not None:
+            try:
+                self.on_transition(self, old, new)
+            except Exception:
+                logger.warning("Circuit transition callback failed",
+                               exc_info=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "transitions": self.transitions,
+            }
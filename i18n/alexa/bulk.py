@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# Runs many request envelopes through the skill in one process, for
+# backfills, QA replays and synthetic load.
+#
+# One skill instance serves the whole batch. Each chunk of envelopes is
+# deserialized first, the users' persistent attributes are then loaded
+# with one bulk read into the persistence cache, and the envelopes are
+# dispatched one by one. Results are yielded as they are produced.
+#
+# Usage, from the i18n directory:
+#   python -m alexa.bulk < envelopes.jsonl > responses.jsonl
+
+import json
+import logging
+import sys
+from itertools import islice
+
+from ask_sdk_model import RequestEnvelope
+
+from alexa.persistence import find_layer
+
+logger = logging.getLogger("main")
+
+
+def read_json_lines(stream):
+    """
+    Yield the non-blank lines of a JSON-lines stream, undecoded.
+    """
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+class BatchRunner(object):
+    """
+    Dispatches envelopes (dicts, or JSON strings such as the lines of a
+    JSON-lines file) through an IndexedSkillBuilder's skill, and yields
+    {"index": n, "response": {...}} or {"index": n, "error": "..."} for
+    each, in order.
+
+    Errors in a handler are turned into responses by the skill's
+    exception handlers (CatchAllExceptionHandler) as usual; an envelope
+    that can't be parsed, or fails outside the handlers, only produces
+    an error record and the batch goes on.
+    """
+
+    def __init__(self, builder, chunk_size=100):
+        self.builder = builder
+        self.chunk_size = chunk_size
+        self.processed = 0
+        self.errors = 0
+
+    def run(self, events, context=None):
+        skill = self.builder.create()
+        cache = find_layer(self.builder.persistence_adapter, "prefetch")
+        events = enumerate(events)
+        while True:
+            chunk = list(islice(events, self.chunk_size))
+            if not chunk:
+                return
+            parsed = [(index,) + self._parse(skill, event)
+                      for index, event in chunk]
+            # envelopes without a context have no user to load, they fail
+            # in the skill on their own
+            envelopes = [envelope for _, _, envelope, _ in parsed
+                         if envelope is not None and
+                         envelope.context is not None]
+            if cache is not None and envelopes:
+                try:
+                    cache.prefetch(envelopes)
+                except Exception:
+                    # the requests read their attributes one by one instead
+                    logger.warning("Batch prefetch failed", exc_info=True)
+
+            for index, event, envelope, error in parsed:
+                if envelope is not None:
+                    try:
+                        with self.builder.request_scope(event, context):
+                            response = skill.serializer.serialize(
+                                skill.invoke(request_envelope=envelope,
+                                             context=context))
+                    except Exception as e:
+                        error = e
+                self.processed += 1
+                if error is not None:
+                    self.errors += 1
+                    logger.error("Envelope {} failed".format(index),
+                                 exc_info=error)
+                    yield {"index": index, "error": "{}: {}".format(
+                        type(error).__name__, error)}
+                else:
+                    yield {"index": index, "response": response}
+
+    def _parse(self, skill, event):
+        """
+        Return (event dict, RequestEnvelope, None) or (event, None, error).
+        """
+        try:
+            if isinstance(event, (str, bytes)):
+                payload, event = event, json.loads(event)
+            else:
+                payload = json.dumps(event)
+            envelope = skill.serializer.deserialize(
+                payload=payload, obj_type=RequestEnvelope)
+            return event, envelope, None
+        except Exception as e:
+            return event, None, e
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s")
+    from lambda_function import sb
+    runner = BatchRunner(sb)
+    for result in runner.run(read_json_lines(sys.stdin)):
+        sys.stdout.write(json.dumps(result) + "\n")
+    logger.warning("{} envelopes, {} errors".format(
+        runner.processed, runner.errors))
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import gettext
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from alexa.messages import CATALOGS as COMPILED_CATALOGS
+except ImportError:
+    COMPILED_CATALOGS = {}
+
+
+class CompiledTranslations(gettext.NullTranslations):
+    """
+    Translations backed by a message table from alexa/messages.py,
+    so lookups are a dict access with no file I/O.
+    """
+
+    def __init__(self, messages):
+        super(CompiledTranslations, self).__init__()
+        self._messages = messages
+
+    def gettext(self, message):
+        return self._messages.get(message, message)
+
+
+class CatalogRegistry(object):
+    """
+    Process-wide cache of gettext catalogs, keyed by request locale.
+
+    Each locale is resolved at most once per warm container. Locales
+    without a catalog are cached too (negative caching), so they don't
+    trigger a directory search on every request. The cache is a bounded
+    LRU so unexpected locales can't grow it without limit.
+
+    Catalogs precompiled into alexa/messages.py (see build_messages.py)
+    are used first, the .mo files are only read for other locales.
+    """
+
+    def __init__(self, domain='data', localedir='locales', maxsize=16,
+                 compiled=None):
+        self.domain = domain
+        self.localedir = localedir
+        self.maxsize = maxsize
+        self.compiled = COMPILED_CATALOGS if compiled is None else compiled
+        self.fallback = gettext.NullTranslations()
+        self._catalogs = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def get(self, locale):
+        """
+        Return the translations object for locale, loading it on first use.
+        Locales without a catalog get the shared NullTranslations fallback.
+        """
+        with self._lock:
+            catalog = self._catalogs.get(locale)
+            if catalog is not None:
+                self._catalogs.move_to_end(locale)
+                if catalog is self.fallback:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return catalog
+            self.misses += 1
+
+        catalog = self._load(locale)
+
+        with self._lock:
+            self._catalogs[locale] = catalog
+            self._catalogs.move_to_end(locale)
+            while len(self._catalogs) > self.maxsize:
+                self._catalogs.popitem(last=False)
+                self.evictions += 1
+        return catalog
+
+    def gettext(self, locale):
+        return self.get(locale).gettext
+
+    def available_locales(self):
+        """
+        Return the locales that have a compiled table or a locale directory.
+        """
+        locales = set(self.compiled)
+        if os.path.isdir(self.localedir):
+            locales.update(
+                name for name in os.listdir(self.localedir)
+                if os.path.isdir(os.path.join(self.localedir, name)))
+        return sorted(locales)
+
+    def preload(self, locales=None):
+        """
+        Load the catalogs for locales (default: every available locale),
+        e.g. from a warm-up request. Returns the number loaded.
+        """
+        locales = self.available_locales() if locales is None else locales
+        for locale in locales:
+            self.get(locale)
+        return len(locales)
+
+    def _load(self, locale):
+        if locale in self.compiled:
+            return CompiledTranslations(self.compiled[locale])
+        try:
+            return gettext.translation(
+                self.domain, localedir=self.localedir, languages=[locale])
+        except OSError:
+            return self.fallback
+
+    def clear(self):
+        with self._lock:
+            self._catalogs.clear()
+
+    def stats(self):
+        """
+        Return a snapshot of the cache counters.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits,
+                "evictions": self.evictions,
+                "size": len(self._catalogs),
+                "missing": sorted(
+                    k for k, v in self._catalogs.items()
+                    if v is self.fallback),
+            }
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+# Fast path for the request envelope and the response JSON.
+#
+# The SDK turns every event into a complete tree of ask_sdk_model objects
+# (json.dumps of the event, json.loads, then every field of every
+# object), although the handlers only read the request type, intent name,
+# slots, locale, user, device and session. FastSerializer wraps the event
+# dict instead: each model object is created empty and converts a field
+# from the dict the first time it is read, so unread parts (viewport,
+# supported interfaces, slot resolutions, timestamps...) cost nothing.
+# Responses are serialized with per-class field tables.
+#
+# Enabled with FAST_CODEC=true. Errors in a malformed envelope surface
+# when the field is read, inside the handlers, instead of up front.
+
+import importlib
+import json
+from datetime import date, datetime
+from enum import Enum
+
+from ask_sdk_core.exceptions import SerializationException
+from ask_sdk_model import RequestEnvelope
+
+from alexa.templates import PrerenderingSerializer, copy_json
+
+_PRIMITIVES = {"str": str, "int": int, "float": float, "bool": bool}
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class LazyModel(object):
+    """
+    Mixin for ask_sdk_model classes whose fields are converted from the
+    payload dict on first access. Instances are created without calling
+    the model's __init__, so unconverted fields are missing from the
+    instance and reach __getattr__.
+    """
+
+    def __getattr__(self, name):
+        fields = self.__dict__
+        if "_payload" not in fields:
+            raise AttributeError(name)
+        cls = type(self)
+        type_name = cls.deserialized_types.get(name)
+        if type_name is None:
+            raise AttributeError(name)
+        value = fields["_codec"].convert(
+            fields["_payload"].get(cls.attribute_map.get(name, name)),
+            type_name)
+        fields[name] = value
+        return value
+
+
+class FastSerializer(PrerenderingSerializer):
+    """
+    PrerenderingSerializer that deserializes request envelopes lazily
+    (see LazyModel) and serializes models with precomputed field lists.
+    Other types go through DefaultSerializer.
+    """
+
+    def __init__(self):
+        super(FastSerializer, self).__init__()
+        self._classes = {}
+        self._lazy_classes = {}
+        self._fields = {}
+
+    def load_event(self, event):
+        """
+        Return the RequestEnvelope for a Lambda event dict, without
+        encoding it to JSON and back.
+        """
+        return self.convert(event, RequestEnvelope)
+
+    def deserialize(self, payload, obj_type):
+        if obj_type is RequestEnvelope and payload is not None:
+            return self.convert(json.loads(payload), RequestEnvelope)
+        return super(FastSerializer, self).deserialize(payload, obj_type)
+
+    def convert(self, value, obj_type):
+        """
+        Convert a decoded JSON value to obj_type, a model class or a
+        type name from a model's deserialized_types.
+        """
+        if value is None:
+            return None
+        if isinstance(obj_type, str):
+            if obj_type.startswith("list["):
+                item_type = obj_type[5:-1]
+                if "," in item_type:
+                    return self._full(value, obj_type)
+                return [self.convert(item, item_type) for item in value]
+            if obj_type.startswith("dict("):
+                item_type = obj_type.split(", ", 1)[1][:-1]
+                return {key: self.convert(item, item_type)
+                        for key, item in value.items()}
+            if obj_type == "object":
+                return value
+            primitive = _PRIMITIVES.get(obj_type)
+            if primitive is not None:
+                return value if type(value) is primitive \
+                    else self._full(value, obj_type)
+            if obj_type in ("date", "datetime"):
+                return self._full(value, obj_type)
+            obj_type = self._load_class(obj_type)
+
+        if issubclass(obj_type, Enum):
+            return obj_type(value)
+        if not hasattr(obj_type, "deserialized_types"):
+            return value
+        if hasattr(obj_type, "get_real_child_model"):
+            child = obj_type.get_real_child_model(value)
+            if not child:
+                raise SerializationException(
+                    "Couldn't resolve object by discriminator type "
+                    "for {} class".format(obj_type))
+            obj_type = self._load_class(child)
+        lazy = self._lazy_class(obj_type)
+        model = lazy.__new__(lazy)
+        model.__dict__["_payload"] = value
+        model.__dict__["_codec"] = self
+        return model
+
+    def _full(self, value, type_name):
+        return super(FastSerializer, self).deserialize(
+            json.dumps(value), type_name)
+
+    def _load_class(self, name):
+        cls = self._classes.get(name)
+        if cls is None:
+            module, _, class_name = name.rpartition(".")
+            cls = self._classes[name] = getattr(
+                importlib.import_module(module), class_name)
+        return cls
+
+    def _lazy_class(self, cls):
+        lazy = self._lazy_classes.get(cls)
+        if lazy is None:
+            lazy = self._lazy_classes[cls] = type(
+                cls.__name__, (LazyModel, cls), {"__module__": cls.__module__})
+        return lazy
+
+    def serialize(self, obj):
+        hit = self._prerendered.get(id(obj))
+        if hit is not None and hit[0] is obj:
+            return copy_json(hit[1])
+        if isinstance(obj, _SCALARS):
+            return obj
+        cls = type(obj)
+        fields = self._fields.get(cls)
+        if fields is None:
+            fields = self._fields[cls] = self._field_list(cls)
+        if fields:
+            serialized = {}
+            for name, key in fields:
+                value = getattr(obj, name)
+                if value is not None:
+                    serialized[key] = self.serialize(value)
+            return serialized
+        if cls is dict:
+            return {key: self.serialize(value) for key, value in obj.items()}
+        if cls is list:
+            return [self.serialize(item) for item in obj]
+        return super(FastSerializer, self).serialize(obj)
+
+    @staticmethod
+    def _field_list(cls):
+        """
+        Return [(attribute, JSON key)] for a model class, or () for types
+        serialized some other way.
+        """
+        types = getattr(cls, "deserialized_types", None)
+        if not types or issubclass(cls, (Enum, dict, date, datetime)):
+            return ()
+        attribute_map = getattr(cls, "attribute_map", {})
+        return tuple((name, attribute_map.get(name, name)) for name in types)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+# Birthday countdown math with no datetime objects on the hot path.
+#
+# Dates are turned into day-of-year numbers with precomputed cumulative
+# month lengths. People born on Feb 29 celebrate on Feb 28 in non-leap
+# years.
+
+import unicodedata
+
+# spoken month names, as AMAZON.Month resolves them in the locales we
+# publish in (see skill-package/skill.json)
+MONTH_NAMES = {
+    'en': ('january', 'february', 'march', 'april', 'may', 'june', 'july',
+           'august', 'september', 'october', 'november', 'december'),
+    'fr': ('janvier', 'février', 'mars', 'avril', 'mai', 'juin', 'juillet',
+           'août', 'septembre', 'octobre', 'novembre', 'décembre'),
+    'it': ('gennaio', 'febbraio', 'marzo', 'aprile', 'maggio', 'giugno',
+           'luglio', 'agosto', 'settembre', 'ottobre', 'novembre',
+           'dicembre'),
+    'es': ('enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio',
+           'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre'),
+    'pt': ('janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho',
+           'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro'),
+    'de': ('januar', 'februar', 'märz', 'april', 'mai', 'juni', 'juli',
+           'august', 'september', 'oktober', 'november', 'dezember'),
+    'hi': ('जनवरी', 'फ़रवरी', 'मार्च', 'अप्रैल', 'मई', 'जून', 'जुलाई',
+           'अगस्त', 'सितंबर', 'अक्टूबर', 'नवंबर', 'दिसंबर'),
+    'ja': ('一月', '二月', '三月', '四月', '五月', '六月', '七月', '八月',
+           '九月', '十月', '十一月', '十二月'),
+}
+
+# alternative spellings that are common in slot values
+MONTH_ALIASES = {
+    'sept': 9, 'jän': 1, 'jänner': 1, 'feber': 2, 'setiembre': 9,
+    'फरवरी': 2, 'सितम्बर': 9, 'अक्तूबर': 10, 'नवम्बर': 11, 'दिसम्बर': 12,
+}
+
+# cumulative days before each month, for common and leap years
+_DAYS_BEFORE = (
+    (0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334),
+    (0, 0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335),
+)
+_DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _normalize(name):
+    return unicodedata.normalize('NFKC', name).casefold().strip().rstrip('.')
+
+
+def _strip_accents(name):
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', name)
+        if unicodedata.category(c) != 'Mn')
+
+
+def _build_month_table():
+    table = {}
+    abbreviations = {}
+
+    def add(name, index):
+        key = _normalize(name)
+        table.setdefault(key, index)
+        table.setdefault(_strip_accents(key), index)
+
+    for names in MONTH_NAMES.values():
+        for index, name in enumerate(names, 1):
+            add(name, index)
+            # three-letter abbreviations for latin scripts, the way the
+            # handler used to match ("Mar", "Sep", ...)
+            key = _strip_accents(_normalize(name))
+            if key.isascii():
+                abbreviations.setdefault(key[:3], set()).add(index)
+    for name, index in MONTH_ALIASES.items():
+        add(name, index)
+    for index in range(1, 13):
+        add(str(index), index)
+        add('{:02d}'.format(index), index)
+        add('{}月'.format(index), index)
+    # ambiguous abbreviations ("jui" is juin or juillet) are left out
+    for key, indexes in abbreviations.items():
+        if len(indexes) == 1:
+            table.setdefault(key, indexes.pop())
+    return table
+
+
+MONTHS = _build_month_table()
+
+
+def is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def month_number(month):
+    """
+    Return the month number (1-12) for a spoken month name, abbreviation
+    or number in any supported language. Raises ValueError if unknown.
+    """
+    try:
+        return MONTHS[month]
+    except KeyError:
+        pass
+    key = _normalize(str(month))
+    index = MONTHS.get(key) or MONTHS.get(_strip_accents(key))
+    if index is None and key.isdecimal() and 1 <= int(key) <= 12:
+        # digits in other scripts, e.g. Devanagari
+        index = int(key)
+    if index is None:
+        # the old behaviour: match on the first three letters
+        index = MONTHS.get(_strip_accents(key)[:3])
+    if index is None:
+        raise ValueError('unknown month: {!r}'.format(month))
+    return index
+
+
+def day_of_year(year, month, day):
+    """
+    Return the 1-based day of the year, moving Feb 29 to Feb 28 in
+    non-leap years.
+    """
+    leap = is_leap(year)
+    if month == 2 and day == 29 and not leap:
+        day = 28
+    return _DAYS_BEFORE[leap][month] + day
+
+
+def days_until_birthday(birth_year, birth_month, birth_day, today):
+    """
+    Return (days, age) where days is the number of days from today (a
+    date) to the next birthday, 0 on the birthday itself, and age is the
+    age the person turns on that birthday.
+    """
+    if not 1 <= birth_month <= 12 or \
+            not 1 <= birth_day <= _DAYS_IN_MONTH[birth_month]:
+        raise ValueError('invalid birthday: {}-{}-{}'.format(
+            birth_year, birth_month, birth_day))
+
+    year = today.year
+    today_doy = _DAYS_BEFORE[is_leap(year)][today.month] + today.day
+    birthday_doy = day_of_year(year, birth_month, birth_day)
+
+    if birthday_doy >= today_doy:
+        return birthday_doy - today_doy, year - birth_year
+
+    days_left = (366 if is_leap(year) else 365) - today_doy
+    return (days_left + day_of_year(year + 1, birth_month, birth_day),
+            year + 1 - birth_year)
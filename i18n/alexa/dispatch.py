@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import glob
+import importlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from ask_sdk_core.attributes_manager import (
+    AbstractPersistenceAdapter, AttributesManager)
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_core.skill_builder import CustomSkillBuilder
+from ask_sdk_model import (
+    Context, Device, Intent, Request, RequestEnvelope, User)
+from ask_sdk_model.interfaces.system import SystemState
+from ask_sdk_runtime.dispatch_components.request_components import (
+    AbstractRequestMapper)
+
+from alexa.persistence import find_layer
+
+logger = logging.getLogger("main")
+
+INTENT_REQUEST = "IntentRequest"
+# request types the skill receives besides IntentRequest
+REQUEST_TYPES = ("LaunchRequest", "SessionEndedRequest")
+
+
+def request_types(handler):
+    """
+    Request types a handler declares it can handle, or None for "any".
+    Handlers that declare intent_names only handle IntentRequests.
+    """
+    types = getattr(handler, "request_types", None)
+    if types is None and getattr(handler, "intent_names", None) is not None:
+        types = (INTENT_REQUEST,)
+    return types
+
+
+def may_handle(handler, request_type, intent_name):
+    types = request_types(handler)
+    if types is not None and request_type not in types:
+        return False
+    intents = getattr(handler, "intent_names", None)
+    if intents is not None and intent_name not in intents:
+        return False
+    return True
+
+
+class EveryAttribute(dict):
+    """
+    Persistent attributes of a sample user who has stored every key
+    (each one None), for asking can_handle predicates that look for keys.
+    """
+
+    def __contains__(self, key):
+        return True
+
+    def __missing__(self, key):
+        return None
+
+
+class SamplePersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Returns fixed attributes and discards writes.
+    """
+
+    def __init__(self, attributes):
+        self.attributes = attributes
+
+    def get_attributes(self, request_envelope):
+        return self.attributes
+
+    def save_attributes(self, request_envelope, attributes):
+        pass
+
+    def delete_attributes(self, request_envelope):
+        pass
+
+
+# the stored states a sample request is tried with: a new user, and a
+# user with every attribute
+SAMPLE_ATTRIBUTES = (dict, EveryAttribute)
+
+
+def sample_inputs(request_type, intent_name=None, locale="en-US"):
+    """
+    Yield a HandlerInput for a minimal request of request_type (and
+    intent_name) for each state in SAMPLE_ATTRIBUTES.
+    """
+    module, _, name = Request.discriminator_value_class_map[
+        request_type].rpartition(".")
+    request = getattr(importlib.import_module(module), name)(locale=locale)
+    if intent_name is not None:
+        request.intent = Intent(name=intent_name, slots={})
+    envelope = RequestEnvelope(request=request, context=Context(
+        system=SystemState(user=User(user_id="sample"),
+                           device=Device(device_id="sample"))))
+    for attributes in SAMPLE_ATTRIBUTES:
+        yield HandlerInput(
+            request_envelope=envelope,
+            attributes_manager=AttributesManager(
+                envelope, persistence_adapter=SamplePersistenceAdapter(
+                    attributes())))
+
+
+def accepts(handler, request_type, intent_name=None):
+    """
+    Return whether handler's can_handle accepts a sample request of
+    request_type (and intent_name) for a new or a returning user.
+    Predicates that raise on the sample count as not accepting it.
+    """
+    for handler_input in sample_inputs(request_type, intent_name):
+        try:
+            if handler.can_handle(handler_input=handler_input):
+                return True
+        except Exception:
+            logger.warning("{}.can_handle failed on a sample {} {}".format(
+                type(handler).__name__, request_type, intent_name or ""),
+                exc_info=True)
+    return False
+
+
+class IndexedRequestMapper(AbstractRequestMapper):
+    """
+    Request mapper that indexes handler chains by request type and intent
+    name, instead of asking every handler's can_handle in turn.
+
+    Handlers opt in by declaring request_types and/or intent_names class
+    attributes. Only the handlers whose declarations match the incoming
+    request (plus the ones that declare nothing) have their can_handle
+    called, in registration order, so the first match is the same one
+    the generic mapper would pick.
+
+    If persistence is a GuardedPersistenceAdapter, storage is only opened
+    to handlers that declare needs_persistence = True, both while their
+    can_handle is asked and while the selected one handles the request.
+    """
+
+    def __init__(self, request_handler_chains, persistence=None):
+        self.request_handler_chains = list(request_handler_chains)
+        self.persistence = persistence
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def candidates(self, request_type, intent_name=None):
+        """
+        Return the chains that could handle this request type / intent.
+        """
+        key = (request_type, intent_name)
+        chains = self._index.get(key)
+        if chains is None:
+            chains = tuple(
+                chain for chain in self.request_handler_chains
+                if may_handle(chain.request_handler, request_type, intent_name))
+            with self._lock:
+                self._index[key] = chains
+        return chains
+
+    def get_request_handler_chain(self, handler_input):
+        request = handler_input.request_envelope.request
+        request_type = request.object_type
+        intent_name = None
+        if request_type == INTENT_REQUEST:
+            intent_name = request.intent.name
+
+        guard = self.persistence
+        for chain in self.candidates(request_type, intent_name):
+            handler = chain.request_handler
+            if guard is not None:
+                guard.allow(getattr(handler, "needs_persistence", False))
+            if handler.can_handle(handler_input=handler_input):
+                return chain
+        if guard is not None:
+            guard.allow(False)
+        return None
+
+    def reachability(self, keys):
+        """
+        Return ({(request_type, intent_name): [handler class names]},
+        [(handler class name, key)]) for the given keys. The first lists,
+        in the order their can_handle would be called, the candidates
+        whose can_handle accepts a sample request for the key (see
+        accepts); the second the candidates that declare the key but
+        whose can_handle rejects it.
+        """
+        report, mismatches = {}, []
+        for key in keys:
+            report[key] = []
+            for chain in self.candidates(*key):
+                handler = chain.request_handler
+                name = type(handler).__name__
+                if accepts(handler, *key):
+                    report[key].append(name)
+                else:
+                    mismatches.append((name, key))
+        return report, mismatches
+
+
+class IndexedSkillBuilder(CustomSkillBuilder):
+    """
+    CustomSkillBuilder that dispatches through an IndexedRequestMapper.
+
+    The stock builder rebuilds its skill configuration on every Lambda
+    invocation; the mapper and its index are built once and reused.
+
+    Its lambda handler also drives the persistence layers: it opens and
+    records the GuardedPersistenceAdapter for each request, and writes
+    the saves a WriteBehindPersistenceAdapter queued once the response is
+    serialized, or once it is sent when the context has after_response
+    (see server.RequestContext). after_response() defers other work the
+    same way.
+
+    With a tracer (alexa.tracing.Tracer), every registered handler and
+    interceptor is timed, and each request is sampled and emitted.
+
+    A serializer, e.g. alexa.templates.PrerenderingSerializer or
+    alexa.codec.FastSerializer, replaces the skill's DefaultSerializer.
+    """
+
+    def __init__(self, persistence_adapter=None, api_client=None,
+                 tracer=None, serializer=None):
+        super(IndexedSkillBuilder, self).__init__(
+            persistence_adapter=persistence_adapter, api_client=api_client)
+        self._request_mapper = None
+        self.tracer = tracer
+        self.serializer = serializer
+        self._instrumented = False
+        self._local = threading.local()
+
+    @property
+    def persistence_guard(self):
+        return find_layer(self.persistence_adapter, "allow")
+
+    @property
+    def write_queue(self):
+        return find_layer(self.persistence_adapter, "detach")
+
+    @property
+    def request_mapper(self):
+        chains = self.runtime_configuration_builder.request_handler_chains
+        mapper = self._request_mapper
+        guard = self.persistence_guard
+        if mapper is None or mapper.request_handler_chains != chains \
+                or mapper.persistence is not guard:
+            mapper = self._request_mapper = IndexedRequestMapper(
+                chains, persistence=guard)
+        return mapper
+
+    @property
+    def skill_configuration(self):
+        skill_config = super(IndexedSkillBuilder, self).skill_configuration
+        skill_config.request_mappers = [self.request_mapper]
+        return skill_config
+
+    def instrument(self, tracer):
+        """
+        Time the can_handle/handle and process methods of every handler
+        and interceptor registered so far.
+        """
+        config = self.runtime_configuration_builder
+        for chain in config.request_handler_chains:
+            tracer.instrument(chain.request_handler, ("can_handle", "handle"))
+        for handler in config.exception_handlers:
+            tracer.instrument(handler, ("can_handle", "handle"))
+        for interceptor in (config.global_request_interceptors +
+                            config.global_response_interceptors):
+            tracer.instrument(interceptor, ("process",))
+
+    def _active_tracer(self):
+        tracer = self.tracer
+        if tracer is None or not tracer.enabled:
+            return None
+        if not self._instrumented:
+            self.instrument(tracer)
+            self._instrumented = True
+        return tracer
+
+    @contextmanager
+    def request_scope(self, event, context):
+        """
+        Wrap the dispatch of one request: sample it for tracing, open the
+        persistence guard and write-behind queue, and record them and
+        write the queued saves once the response has been serialized.
+        """
+        tracer = self._active_tracer()
+        guard = self.persistence_guard
+        queue = self.write_queue
+        if tracer is not None:
+            tracer.begin_request(event)
+        if guard is not None:
+            guard.begin_request()
+        if queue is not None:
+            queue.begin_request(context)
+        self._local.callbacks = []
+        try:
+            yield
+        finally:
+            if queue is not None:
+                self._write_queued(queue)
+            self._run_callbacks(context)
+            if guard is not None:
+                guard.end_request()
+            if tracer is not None:
+                tracer.end_request()
+
+    def after_response(self, callback):
+        """
+        Call callback(sent) once the current request's response has been
+        produced: after it has been sent if the context can run work then
+        (see server.RequestContext.after_response), else before the
+        lambda handler returns. sent tells which. Outside a request it is
+        called right away.
+        """
+        callbacks = getattr(self._local, "callbacks", None)
+        if callbacks is None:
+            callback(False)
+        else:
+            callbacks.append(callback)
+
+    def _run_callbacks(self, context):
+        callbacks = self._local.callbacks
+        self._local.callbacks = None
+        later = getattr(context, "after_response", None)
+        for callback in callbacks:
+            if later is not None:
+                later(functools.partial(callback, True))
+                continue
+            try:
+                callback(False)
+            except Exception:
+                logger.error("After-response callback failed", exc_info=True)
+
+    def _write_queued(self, queue):
+        """
+        Write the saves the request queued, see after_response. Users
+        whose save failed are dropped from the cache (see
+        CachingPersistenceAdapter.invalidate), which already holds the
+        unsaved value.
+        """
+        pending = queue.detach()
+        if not pending:
+            return
+        cache = find_layer(self.persistence_adapter, "invalidate")
+
+        def write(sent):
+            failed = queue.write(pending, after_response=sent)
+            if cache is not None:
+                for request_envelope in failed:
+                    cache.invalidate(request_envelope)
+
+        self.after_response(write)
+
+    def create(self):
+        self._active_tracer()
+        skill = super(IndexedSkillBuilder, self).create()
+        if self.serializer is not None:
+            skill.serializer = self.serializer
+        return skill
+
+    def lambda_handler(self):
+        self._active_tracer()
+
+        # as SkillBuilder.lambda_handler, with the skill from create()
+        def wrapper(event, context):
+            with self.request_scope(event, context):
+                skill = self.create()
+                request_envelope = request_envelope_from(skill, event)
+                response_envelope = skill.invoke(
+                    request_envelope=request_envelope, context=context)
+                return skill.serializer.serialize(response_envelope)
+        return wrapper
+
+    def log_reachability(self, keys):
+        """
+        Log which handlers are reachable for each request type / intent,
+        and warn about handlers whose can_handle rejects a request they
+        declare, and about handlers that no key can reach.
+        """
+        report, mismatches = self.request_mapper.reachability(keys)
+        reached = set()
+        for (request_type, intent_name), names in sorted(
+                report.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+            reached.update(names)
+            logger.info("{} {}: {}".format(
+                request_type, intent_name or "", ", ".join(names) or "-"))
+        for name, (request_type, intent_name) in sorted(
+                mismatches, key=lambda item: (item[1][0], item[1][1] or "")):
+            logger.warning("{} declares {} {} but its can_handle rejects "
+                           "it".format(name, request_type, intent_name or ""))
+        for chain in self.request_mapper.request_handler_chains:
+            name = type(chain.request_handler).__name__
+            if name not in reached:
+                logger.warning("{} is not reachable".format(name))
+        return report
+
+
+def request_envelope_from(skill, event):
+    """
+    Deserialize a Lambda event for skill. Serializers with load_event
+    (alexa.codec.FastSerializer) read the dict as it is.
+    """
+    load_event = getattr(skill.serializer, "load_event", None)
+    if load_event is not None:
+        return load_event(event)
+    return skill.serializer.deserialize(
+        payload=json.dumps(event), obj_type=RequestEnvelope)
+
+
+def interaction_model_keys(pattern):
+    """
+    Return the (request_type, intent_name) keys for every intent in the
+    interaction models matching pattern, plus the other request types.
+    """
+    keys = {(request_type, None) for request_type in REQUEST_TYPES}
+    for path in glob.glob(pattern):
+        with open(path, encoding="utf-8") as model_file:
+            model = json.load(model_file)
+        for intent in model["interactionModel"]["languageModel"]["intents"]:
+            keys.add((INTENT_REQUEST, intent["name"]))
+    return keys
+
+
+if __name__ == "__main__":
+    # build-time report: python -m alexa.dispatch, from the i18n directory
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.INFO)
+    from lambda_function import sb
+    sb.log_reachability(interaction_model_keys(os.path.join(
+        "skill-package", "interactionModels", "custom", "*.json")))
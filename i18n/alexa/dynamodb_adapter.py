@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_core.exceptions import PersistenceException
+
+# the attributes the birthday handlers read; everything else written by
+# the skill stays in the item but is not fetched
+BIRTHDAY_ATTRIBUTES = ("year", "month", "day", "timezones")
+
+# BatchGetItem limit
+BATCH_SIZE = 100
+
+
+def user_id_keygen(request_envelope):
+    return request_envelope.context.system.user.user_id
+
+
+class DynamoDbAttributesAdapter(AbstractPersistenceAdapter):
+    """
+    Stores each user's attributes as top-level attributes of one DynamoDB
+    item, so reads are a single GetItem with a projection and writes
+    only SET the attributes the skill changed.
+
+    table is a boto3 Table resource, or LocalTable for offline runs.
+    """
+
+    def __init__(self, table_name=None, table=None, partition_key_name="id",
+                 projection=BIRTHDAY_ATTRIBUTES, object_keygen=user_id_keygen):
+        self.resource = None
+        if table is None:
+            import boto3
+            self.resource = boto3.resource("dynamodb")
+            table = self.resource.Table(table_name)
+        self.table = table
+        self.partition_key_name = partition_key_name
+        self.projection = tuple(projection) if projection else None
+        self.object_keygen = object_keygen
+
+    def _key(self, request_envelope):
+        return {self.partition_key_name: self.object_keygen(request_envelope)}
+
+    def _projection(self):
+        if not self.projection:
+            return {}
+        names = {"#a{}".format(i): name
+                 for i, name in enumerate(self.projection)}
+        # the key is needed to match BatchGetItem results to users
+        names["#k"] = self.partition_key_name
+        return {"ProjectionExpression": ", ".join(names),
+                "ExpressionAttributeNames": names}
+
+    def get_attributes(self, request_envelope):
+        params = {"Key": self._key(request_envelope)}
+        params.update(self._projection())
+        try:
+            item = self.table.get_item(**params).get("Item") or {}
+        except Exception as e:
+            raise PersistenceException(
+                "Failed to get attributes from DynamoDb table. Exception of "
+                "type {} occurred: {}".format(type(e).__name__, str(e)))
+        item.pop(self.partition_key_name, None)
+        return item
+
+    def get_attributes_many(self, request_envelopes):
+        """
+        Return {user id: attributes} for the users of request_envelopes,
+        with BatchGetItem calls of up to 100 keys.
+        """
+        ids = list(OrderedDict.fromkeys(
+            self.object_keygen(request_envelope)
+            for request_envelope in request_envelopes))
+        found = {}
+        try:
+            for start in range(0, len(ids), BATCH_SIZE):
+                keys = [{self.partition_key_name: object_id}
+                        for object_id in ids[start:start + BATCH_SIZE]]
+                for item in self._batch_get(keys):
+                    found[item.pop(self.partition_key_name)] = item
+        except Exception as e:
+            raise PersistenceException(
+                "Failed to get attributes from DynamoDb table. Exception of "
+                "type {} occurred: {}".format(type(e).__name__, str(e)))
+        return {object_id: found.get(object_id, {}) for object_id in ids}
+
+    def _batch_get(self, keys):
+        request = dict(self._projection(), Keys=keys)
+        if isinstance(self.table, LocalTable):
+            return self.table.batch_get_item(**request)
+        if self.resource is None:
+            import boto3
+            self.resource = boto3.resource("dynamodb")
+
+        items = []
+        pending = {self.table.name: request}
+        for attempt in range(10):
+            response = self.resource.batch_get_item(RequestItems=pending)
+            items.extend(response["Responses"].get(self.table.name, []))
+            pending = response.get("UnprocessedKeys")
+            if not pending:
+                return items
+            # throttled, retry what's left with backoff
+            time.sleep(0.05 * 2 ** attempt)
+        raise RuntimeError("BatchGetItem left keys unprocessed")
+
+    def save_attributes(self, request_envelope, attributes):
+        # only write the fields that changed, when the caller tracks them
+        changed = getattr(attributes, "changed", None)
+        attributes = {k: v for k, v in attributes.items()
+                      if k != self.partition_key_name
+                      if changed is None or k in changed}
+        if not attributes:
+            return
+        names, values, assignments = {}, {}, []
+        for i, (name, value) in enumerate(attributes.items()):
+            names["#a{}".format(i)] = name
+            values[":v{}".format(i)] = value
+            assignments.append("#a{0} = :v{0}".format(i))
+        try:
+            self.table.update_item(
+                Key=self._key(request_envelope),
+                UpdateExpression="SET " + ", ".join(assignments),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values)
+        except Exception as e:
+            raise PersistenceException(
+                "Failed to save attributes to DynamoDb table. Exception of "
+                "type {} occurred: {}".format(type(e).__name__, str(e)))
+
+    def delete_attributes(self, request_envelope):
+        try:
+            self.table.delete_item(Key=self._key(request_envelope))
+        except Exception as e:
+            raise PersistenceException(
+                "Failed to delete attributes from DynamoDb table. Exception "
+                "of type {} occurred: {}".format(type(e).__name__, str(e)))
+
+
+class LocalTable(object):
+    """
+    In-process stand-in for the subset of the boto3 Table API that
+    DynamoDbAttributesAdapter uses, for load tests and offline runs.
+    """
+
+    def __init__(self, partition_key_name="id"):
+        self.partition_key_name = partition_key_name
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def get_item(self, Key, ProjectionExpression=None,
+                 ExpressionAttributeNames=None):
+        with self._lock:
+            item = self.items.get(Key[self.partition_key_name])
+            if item is None:
+                return {}
+            if ProjectionExpression:
+                names = [ExpressionAttributeNames.get(n.strip(), n.strip())
+                         for n in ProjectionExpression.split(",")]
+                item = {k: v for k, v in item.items() if k in names}
+            return {"Item": deepcopy(item)}
+
+    def batch_get_item(self, Keys, ProjectionExpression=None,
+                       ExpressionAttributeNames=None):
+        """
+        Items for Keys, like the Responses of a BatchGetItem for this table.
+        """
+        items = []
+        for key in Keys:
+            item = self.get_item(key, ProjectionExpression,
+                                 ExpressionAttributeNames).get("Item")
+            if item is not None:
+                items.append(item)
+        return items
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames,
+                    ExpressionAttributeValues):
+        with self._lock:
+            key = Key[self.partition_key_name]
+            item = self.items.setdefault(key, dict(Key))
+            for assignment in UpdateExpression[len("SET "):].split(","):
+                name, value = (part.strip() for part in assignment.split("="))
+                item[ExpressionAttributeNames[name]] = deepcopy(
+                    ExpressionAttributeValues[value])
+        return {}
+
+    def delete_item(self, Key):
+        with self._lock:
+            self.items.pop(Key[self.partition_key_name], None)
+        return {}
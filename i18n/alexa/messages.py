@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# Generated by build_messages.py from locales/*/LC_MESSAGES/data.po.
+# Do not edit by hand, run `python build_messages.py` instead.
+
+CATALOGS = {
+    'en-US': {
+    },
+    'fr-CA': {
+        'Hello! Welcome to Cake Time. What is your birthday?':
+            'Bonjour! Bienvenue sur le Génie des Fêtes. Quelle est votre date de naissance ?',
+        'I was born Nov. 6th, 2014. When were you born?':
+            'Je suis née le 6 novembre 2014. Et vous, quand êtes-vous né ?',
+        'Welcome back. It looks like there is {} day until your {}th birthday.':
+            "Content de vous revoir! Il vous reste {} jour avant d'avoir {} ans.",
+        'Welcome back. It looks like there are {} days until your {}th birthday':
+            "Content de vous revoir! Il vous reste {} jours avant d'avoir {} ans.",
+        'Happy {}th birthday!':
+            "Bonne Fête! Aujourd'hui, vous avez {} an!",
+        "Thanks, I'll remember that you were born {} {} {}":
+            'Merci, je vais me rappeler que vous êtes né le {} {} {}.',
+        "You can tell me your date of birth and I'll take note. You can also just say, 'register my birthday' and I will guide you. Which one would you like to try?":
+            'Je peux me souvenir de votre date de naissance. Dites-moi votre jour, mois et année de naissance ou bien dites-moi simplement "sauve ma fête" et je vous guiderai. Quel est votre choix ?',
+        'Goodbye!':
+            'Au revoir!',
+        "Sorry, I couldn't understand what you said. Can you reformulate?":
+            "Désolé, je n'ai pas compris. Pouvez-vous reformuler ?",
+        "I can't determine your timezone. Please check your device settings and make sure a timezone was selected. After that please reopen the skill and try again!":
+            "Je n'ai pas réussi à déterminer votre fuseau horaire. Veuillez vérifier les paramètres de votre appareil et réessayez.",
+    },
+    'fr-FR': {
+        'Hello! Welcome to Cake Time. What is your birthday?':
+            'Bonjour! Bienvenue sur le Génie des Anniversaires. Quelle est votre date de naissance ?',
+        'I was born Nov. 6th, 2014. When were you born?':
+            'Bonjour! Bienvenue sur le Génie des Anniversaires. Quelle est votre date de naissance ?',
+        'Welcome back. It looks like there is {} day until your {}th birthday.':
+            "Content de vous revoir! Il vous reste {} jour avant d'avoir {} ans.",
+        'Welcome back. It looks like there are {} days until your {}th birthday':
+            "Content de vous revoir! Il vous reste {} jours avant d'avoir {} ans.",
+        'Happy {}th birthday!':
+            "Joyeux Anniversaire! Aujourd'hui, vous avez {} an!",
+        "Thanks, I'll remember that you were born {} {} {}":
+            'Merci, je vais me rappeler que vous êtes né le {} {} {}.',
+        "You can tell me your date of birth and I'll take note. You can also just say, 'register my birthday' and I will guide you. Which one would you like to try?":
+            'Je peux me souvenir de votre date de naissance. Dites-moi votre jour, mois et année de naissance ou bien dites-moi simplement "enregistre mon anniversaire" et je vous guiderai. Quel est votre choix ?',
+        'Goodbye!':
+            'Au revoir!',
+        "Sorry, I couldn't understand what you said. Can you reformulate?":
+            "Désolé, je n'ai pas compris. Pouvez-vous reformuler ?",
+        "I can't determine your timezone. Please check your device settings and make sure a timezone was selected. After that please reopen the skill and try again!":
+            "Je n'ai pas réussi à déterminer votre fuseau horaire. Veuillez vérifier les paramètres de votre appareil et réessayez.",
+    },
+    'hi-IN': {
+        'Hello! Welcome to Cake Time. What is your birthday?':
+            'नमस्ते. Cake Time में आपका स्वागत. आपका जनमदिन कब हैं?',
+        'I was born Nov. 6th, 2014. When were you born?':
+            'मेरा जन्म 6 नवंबर, 2014 को हुआ था. आप कब पैदा हुए थे?',
+        'Welcome back. It looks like there is {} day until your {}th birthday.':
+            'वापसी पर स्वागत है. आपके {} वे जनमदिन तक {} दिन हैं`',
+        'Welcome back. It looks like there are {} days until your {}th birthday':
+            'आपके {} वे जनमदिन तक {} दिन हैं',
+        'Happy {}th birthday!':
+            '{} वां जन्मदिन मुबारक हो',
+        "Thanks, I'll remember that you were born {} {} {}":
+            'शुक्रिया. मुझे याद होगा कि आप {} {} {} मैं पैदा हुए थेैं',
+        "You can tell me your date of birth and I'll take note. You can also just say, 'register my birthday' and I will guide you. Which one would you like to try?":
+            'आप मुझे अपनी जन्मतिथि बता सकते हैं और मैं note कर लूंगा. आप यह भी कह सकते हैं, "मेरा जन्मदिन register करें. आप कौन सा प्रयास करना चाहेंगे?',
+        'Goodbye!':
+            'अलवादी',
+        "Sorry, I couldn't understand what you said. Can you reformulate?":
+            'Sorry, मैं वो समझ नहीं पायी. क्या आप दोहरा सकते हैं ',
+        "I can't determine your timezone. Please check your device settings and make sure a timezone was selected. After that please reopen the skill and try again!":
+            'Sorry. मैं आपके समयक्षेत्र का निर्धारण नहीं कर सकता. आपकी Device Settings में timezone select कर दो और एक और बार skill खोलो.',
+    },
+    'it-IT': {
+        'Hello! Welcome to Cake Time. What is your birthday?':
+            "Ciao! Benvenuti a Buon Compleanno. Qual'è la tua data di nascita?",
+        'I was born Nov. 6th, 2014. When were you born?':
+            'Io sono nata il 6 novembre 2014. E tu invece?',
+        'Welcome back. It looks like there is {} day until your {}th birthday.':
+            'Ciao di nuovo! Manca {} giorno a quando avrai {} anni.',
+        'Welcome back. It looks like there are {} days until your {}th birthday':
+            'Ciao di nuovo! Mancano {} giorni a quando avrai {} anni.',
+        'Happy {}th birthday!':
+            'Buon compleanno! Oggi compi {} anno!',
+        "Thanks, I'll remember that you were born {} {} {}":
+            'Grazie, mi ricorderò la tua data di nascita: {} {} {}.',
+        "You can tell me your date of birth and I'll take note. You can also just say, 'register my birthday' and I will guide you. Which one would you like to try?":
+            'Posso segnarmi la tua data di nascita. Dimmi pure la data oppure dimmi di ricordami il tuo compleanno. Cosa preferisci?',
+        'Goodbye!':
+            'A presto!',
+        "Sorry, I couldn't understand what you said. Can you reformulate?":
+            'Scusa, non ho capito. Puoi ripetere?',
+        "I can't determine your timezone. Please check your device settings and make sure a timezone was selected. After that please reopen the skill and try again!":
+            'Non ho potuto determinare il tuo fuso orario. Verifica la configurazione del tuo dispositivo, e riprova.',
+    },
+    'ja-JP': {
+        'Hello! Welcome to Cake Time. What is your birthday?':
+            'こんにちは、ケークウォークへようこそ。あなたの誕生日はいつですか？',
+        'I was born Nov. 6th, 2014. When were you born?':
+            '私は2004年10月6日に生まれました。あなたの誕生日はいつですか？',
+        'Welcome back. It looks like there is {} day until your {}th birthday.':
+            'おかえりなさい。{}歳のお誕生日まで、あと{{count}}日です。',
+        'Welcome back. It looks like there are {} days until your {}th birthday':
+            'おかえりなさい。{}歳のお誕生日まで、残り{}日です。',
+        'Happy {}th birthday!':
+            '{}歳のお誕生日、おめでとうございます！',
+        "Thanks, I'll remember that you were born {} {} {}":
+            'ありがとうございます。誕生日は {}年 {}月 {}日ですね？',
+        "You can tell me your date of birth and I'll take note. You can also just say, 'register my birthday' and I will guide you. Which one would you like to try?":
+            'あなたの誕生日を言うと、その日付を記憶します。もしくは、「私の誕生日を登録して」と言うと、詳しくご案内します。どちらにしますか？',
+        'Goodbye!':
+            'さようなら',
+        "Sorry, I couldn't understand what you said. Can you reformulate?":
+            'ごめんなさい、うまく理解できませんでした。もう一度言ってみてください。',
+        "I can't determine your timezone. Please check your device settings and make sure a timezone was selected. After that please reopen the skill and try again!":
+            'タイムゾーンを特定できませんでした。Alexaアプリでデバイスの設定を開き、タイムゾーンが正しく選択されていることを確認したあとで、もう一度試してください。',
+    },
+}
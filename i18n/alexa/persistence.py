@@ -0,0 +1,558 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_core.exceptions import AttributesManagerException
+
+logger = logging.getLogger("main")
+
+
+def user_id_keygen(request_envelope):
+    return request_envelope.context.system.user.user_id
+
+
+# keys the skill keeps in session attributes that must never be persisted,
+# CacheSpeechForRepeatInterceptor stores the last response there
+TRANSIENT_ATTRIBUTES = ("speech", "reprompt")
+
+
+class TrackedAttributes(dict):
+    """
+    Persistent attributes that remember which keys were given a new value.
+    Adapters that can update single fields (DynamoDbAttributesAdapter)
+    only write the keys in changed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TrackedAttributes, self).__init__(*args, **kwargs)
+        self.changed = set()
+
+    def __setitem__(self, key, value):
+        if key not in self or self[key] != value:
+            self.changed.add(key)
+        super(TrackedAttributes, self).__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __deepcopy__(self, memo):
+        # dict's constructor doesn't go through __setitem__, so the copy
+        # keeps the original's changed keys instead of marking them all
+        copied = TrackedAttributes(deepcopy(dict(self), memo))
+        copied.changed = set(self.changed)
+        return copied
+
+
+def save_changes(attributes_manager, values, transient=TRANSIENT_ATTRIBUTES):
+    """
+    Merge values into the persistent attributes and save them, leaving out
+    transient keys. Nothing is written when every value already matches
+    what is stored. Returns whether a write happened.
+    """
+    stored = attributes_manager.persistent_attributes
+    attributes = TrackedAttributes(
+        (k, v) for k, v in stored.items() if k not in transient)
+    attributes.update(
+        (k, v) for k, v in values.items() if k not in transient)
+    if not attributes.changed:
+        return False
+    attributes_manager.persistent_attributes = attributes
+    attributes_manager.save_persistent_attributes()
+    return True
+
+
+def get_attributes_many(adapter, request_envelopes, keygen=user_id_keygen,
+                        max_workers=8):
+    """
+    Return {key: attributes} for the users of request_envelopes, with a
+    bulk read when the adapter has get_attributes_many (DynamoDB), else
+    with concurrent single reads.
+    """
+    if hasattr(adapter, "get_attributes_many"):
+        return adapter.get_attributes_many(request_envelopes)
+    unique = OrderedDict(
+        (keygen(request_envelope), request_envelope)
+        for request_envelope in request_envelopes)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(
+            lambda request_envelope: adapter.get_attributes(
+                request_envelope=request_envelope),
+            unique.values())
+        return dict(zip(unique, results))
+
+
+def storage_adapter(backend=None, lazy=True):
+    """
+    Return the storage adapter selected by PERSISTENCE_BACKEND:
+
+    - "s3" (default): RevalidatingS3Adapter on S3_PERSISTENCE_BUCKET,
+      writing compact records unless PERSISTENCE_RECORD_FORMAT is "json"
+      (legacy JSON objects, still readable by code from before them)
+    - "dynamodb": DynamoDbAttributesAdapter on DYNAMODB_PERSISTENCE_TABLE
+    - "local": DynamoDbAttributesAdapter on an in-process LocalTable, for
+      offline load tests
+
+    Unless lazy is False the adapter, and boto3 with it, is only built
+    when a handler first uses persistent attributes.
+    """
+    backend = (backend or os.environ.get("PERSISTENCE_BACKEND") or "s3").lower()
+    if backend not in ("s3", "dynamodb", "local"):
+        raise ValueError("Unknown PERSISTENCE_BACKEND {!r}".format(backend))
+    if lazy:
+        return LazyPersistenceAdapter(lambda: storage_adapter(backend, False))
+    if backend == "s3":
+        from alexa.s3_adapter import RevalidatingS3Adapter
+        return RevalidatingS3Adapter(
+            bucket_name=os.environ.get(
+                "S3_PERSISTENCE_BUCKET", "custom-walk-testing"),
+            compact=os.environ.get(
+                "PERSISTENCE_RECORD_FORMAT", "compact").lower() != "json")
+    if backend in ("dynamodb", "local"):
+        from alexa.dynamodb_adapter import DynamoDbAttributesAdapter, LocalTable
+        if backend == "local":
+            return DynamoDbAttributesAdapter(table=LocalTable())
+        return DynamoDbAttributesAdapter(
+            table_name=os.environ["DYNAMODB_PERSISTENCE_TABLE"])
+
+
+class LazyPersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Builds the adapter returned by factory on first use. Keeps boto3 and
+    the storage client out of cold starts for requests that never touch
+    persistent attributes.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    @property
+    def target(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self.factory()
+        return self._target
+
+    def build(self):
+        """
+        Build the adapter now, e.g. from a warm-up request.
+        """
+        return self.target
+
+    def get_attributes(self, request_envelope):
+        return self.target.get_attributes(request_envelope=request_envelope)
+
+    def get_attributes_if_changed(self, request_envelope, etag=None):
+        target = self.target
+        if hasattr(target, "get_attributes_if_changed"):
+            return target.get_attributes_if_changed(
+                request_envelope=request_envelope, etag=etag)
+        return target.get_attributes(request_envelope=request_envelope), None
+
+    def get_attributes_many(self, request_envelopes):
+        return get_attributes_many(self.target, request_envelopes)
+
+    def save_attributes(self, request_envelope, attributes):
+        return self.target.save_attributes(
+            request_envelope=request_envelope, attributes=attributes)
+
+    def delete_attributes(self, request_envelope):
+        self.target.delete_attributes(request_envelope=request_envelope)
+
+
+class GuardedPersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Wraps a persistence adapter so storage is only touched on behalf of
+    handlers that declare needs_persistence = True.
+
+    The request mapper opens the guard while it asks a handler that
+    declared it, and closes it otherwise, so Help, Cancel/Stop,
+    SessionEnded and error paths never cause a storage round-trip.
+    Every request's gets/puts are recorded, to track storage calls per
+    1,000 requests.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.requests_with_get = 0
+        self.gets = 0
+        self.puts = 0
+
+    def allow(self, allowed):
+        self._local.allowed = allowed
+
+    def begin_request(self):
+        self._local.allowed = False
+        self._local.gets = 0
+        self._local.puts = 0
+
+    def end_request(self):
+        """
+        Record the request and return its {"gets": n, "puts": n}.
+        """
+        record = {
+            "gets": getattr(self._local, "gets", 0),
+            "puts": getattr(self._local, "puts", 0),
+        }
+        with self._lock:
+            self.requests += 1
+            self.requests_with_get += 1 if record["gets"] else 0
+            self.gets += record["gets"]
+            self.puts += record["puts"]
+        logger.info("Storage round trips: {}".format(record))
+        self._local.allowed = False
+        return record
+
+    def _check(self, action):
+        if not getattr(self._local, "allowed", True):
+            raise AttributesManagerException(
+                "Cannot {} PersistentAttributes from a handler that does "
+                "not declare needs_persistence".format(action))
+
+    def get_attributes(self, request_envelope):
+        self._check("get")
+        attributes = self.adapter.get_attributes(
+            request_envelope=request_envelope)
+        if not getattr(self.adapter, "last_get_cached", False):
+            self._local.gets = getattr(self._local, "gets", 0) + 1
+        return attributes
+
+    def save_attributes(self, request_envelope, attributes):
+        self._check("save")
+        self._local.puts = getattr(self._local, "puts", 0) + 1
+        self.adapter.save_attributes(
+            request_envelope=request_envelope, attributes=attributes)
+
+    def delete_attributes(self, request_envelope):
+        self._check("delete")
+        self._local.puts = getattr(self._local, "puts", 0) + 1
+        self.adapter.delete_attributes(request_envelope=request_envelope)
+
+    def stats(self):
+        with self._lock:
+            requests = self.requests or 1
+            return {
+                "requests": self.requests,
+                "requests_with_get": self.requests_with_get,
+                "gets": self.gets,
+                "puts": self.puts,
+                "gets_per_1000": 1000.0 * self.gets / requests,
+            }
+
+
+class CachingPersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Read-through LRU cache in front of any persistence adapter, keyed by
+    the object key (the user id by default).
+
+    Saves are written through to the wrapped adapter and then cached.
+    Entries older than ttl are revalidated: if the wrapped adapter has
+    get_attributes_if_changed (see alexa.s3_adapter), that is a cheap
+    conditional GET on the stored ETag, otherwise a full read.
+    """
+
+    def __init__(self, adapter, maxsize=1024, ttl=60, keygen=user_id_keygen,
+                 clock=time.monotonic):
+        self.adapter = adapter
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.keygen = keygen
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.prefetched = 0
+
+    @property
+    def last_get_cached(self):
+        """
+        Whether the last get_attributes on this thread was served without
+        a storage round-trip.
+        """
+        return getattr(self._local, "cached", False)
+
+    def get_attributes(self, request_envelope):
+        key = self.keygen(request_envelope)
+        revalidate = hasattr(self.adapter, "get_attributes_if_changed")
+        with self._lock:
+            entry = self._entries.get(key)
+            fresh = entry is not None and self.clock() - entry[2] < self.ttl
+            if fresh:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        self._local.cached = fresh
+        if fresh:
+            return deepcopy(entry[0])
+
+        if revalidate:
+            etag = entry[1] if entry is not None else None
+            attributes, new_etag = self.adapter.get_attributes_if_changed(
+                request_envelope=request_envelope, etag=etag)
+            if attributes is None:
+                # 304 Not Modified, the cached copy is still current
+                attributes = entry[0]
+                with self._lock:
+                    self.revalidated += 1
+        else:
+            attributes, new_etag = self.adapter.get_attributes(
+                request_envelope=request_envelope), None
+        self._store(key, attributes, new_etag)
+        return deepcopy(attributes)
+
+    def peek(self, request_envelope):
+        """
+        Return the cached attributes of the user, fresh or not, without
+        reading storage or counting a hit; None if the user isn't cached.
+        The attributes are not a copy and must not be modified.
+        """
+        with self._lock:
+            entry = self._entries.get(self.keygen(request_envelope))
+        return None if entry is None else entry[0]
+
+    def prefetch(self, request_envelopes):
+        """
+        Load the users of request_envelopes that aren't fresh in the cache
+        with one bulk read (see get_attributes_many), e.g. before a batch.
+        Returns the number of users loaded.
+        """
+        now = self.clock()
+        missing = OrderedDict()
+        with self._lock:
+            for request_envelope in request_envelopes:
+                key = self.keygen(request_envelope)
+                entry = self._entries.get(key)
+                if entry is None or now - entry[2] >= self.ttl:
+                    missing.setdefault(key, request_envelope)
+        if not missing:
+            return 0
+
+        loaded = get_attributes_many(
+            self.adapter, list(missing.values()), keygen=self.keygen)
+        for key, attributes in loaded.items():
+            self._store(key, attributes, None)
+        with self._lock:
+            self.prefetched += len(loaded)
+        return len(loaded)
+
+    def save_attributes(self, request_envelope, attributes):
+        key = self.keygen(request_envelope)
+        etag = self.adapter.save_attributes(
+            request_envelope=request_envelope, attributes=attributes)
+        # adapters that report the new ETag keep the entry revalidatable
+        self._store(key, deepcopy(attributes), etag)
+
+    def delete_attributes(self, request_envelope):
+        self.invalidate(request_envelope)
+        self.adapter.delete_attributes(request_envelope=request_envelope)
+
+    def invalidate(self, request_envelope):
+        """
+        Drop the user's entry, so the next read goes to storage, e.g.
+        after a write-behind save of the cached value failed.
+        """
+        with self._lock:
+            self._entries.pop(self.keygen(request_envelope), None)
+
+    def _store(self, key, attributes, etag):
+        with self._lock:
+            self._entries[key] = (attributes, etag, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "prefetched": self.prefetched,
+                "size": len(self._entries),
+            }
+
+
+class WriteBehindPersistenceAdapter(AbstractPersistenceAdapter):
+    """
+    Queues saves during a request and writes them once the response has
+    been produced. Several saves for the same user in one request are
+    coalesced into one write, and reads see the queued value.
+
+    The skill builder takes the queue with detach() and passes it to
+    write(): after the response has been sent when the host allows it
+    (server.py), else before returning it (Lambda), which only saves the
+    coalesced writes.
+
+    When the invocation has less than min_remaining_ms left, or outside
+    a request, saves are written synchronously instead so a timeout
+    can't lose them.
+    """
+
+    def __init__(self, adapter, min_remaining_ms=1000, keygen=user_id_keygen):
+        self.adapter = adapter
+        self.min_remaining_ms = min_remaining_ms
+        self.keygen = keygen
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.coalesced = 0
+        self.sync_writes = 0
+        self.failures = 0
+        self.write_ms = 0.0
+        self.saved_ms = 0.0
+
+    def begin_request(self, context=None):
+        self._local.context = context
+        self._local.pending = OrderedDict()
+
+    def _pending(self):
+        return getattr(self._local, "pending", None)
+
+    def _time_is_short(self):
+        context = getattr(self._local, "context", None)
+        if context is None or not hasattr(
+                context, "get_remaining_time_in_millis"):
+            return False
+        return context.get_remaining_time_in_millis() < self.min_remaining_ms
+
+    def get_attributes(self, request_envelope):
+        pending = self._pending()
+        key = self.keygen(request_envelope)
+        if pending and key in pending:
+            return deepcopy(pending[key][1])
+        return self.adapter.get_attributes(request_envelope=request_envelope)
+
+    def get_attributes_if_changed(self, request_envelope, etag=None):
+        pending = self._pending()
+        if pending and self.keygen(request_envelope) in pending:
+            return self.get_attributes(request_envelope), None
+        if hasattr(self.adapter, "get_attributes_if_changed"):
+            return self.adapter.get_attributes_if_changed(
+                request_envelope=request_envelope, etag=etag)
+        return self.get_attributes(request_envelope), None
+
+    def get_attributes_many(self, request_envelopes):
+        loaded = get_attributes_many(
+            self.adapter, request_envelopes, keygen=self.keygen)
+        for key, (_, attributes) in (self._pending() or {}).items():
+            if key in loaded:
+                loaded[key] = deepcopy(attributes)
+        return loaded
+
+    def save_attributes(self, request_envelope, attributes):
+        pending = self._pending()
+        if pending is None or self._time_is_short():
+            with self._lock:
+                self.sync_writes += 1
+            return self.adapter.save_attributes(
+                request_envelope=request_envelope, attributes=attributes)
+
+        key = self.keygen(request_envelope)
+        attributes = deepcopy(attributes)
+        if key in pending:
+            with self._lock:
+                self.coalesced += 1
+            # the write must also cover the fields the queued save changed
+            queued = getattr(pending[key][1], "changed", None)
+            if queued is None:
+                attributes = dict(attributes)
+            elif getattr(attributes, "changed", None) is not None:
+                attributes.changed |= queued
+        pending[key] = (request_envelope, attributes)
+
+    def delete_attributes(self, request_envelope):
+        pending = self._pending()
+        if pending:
+            pending.pop(self.keygen(request_envelope), None)
+        self.adapter.delete_attributes(request_envelope=request_envelope)
+
+    def detach(self):
+        """
+        Return the saves queued by this request, or None, and stop
+        queueing until the next begin_request.
+        """
+        pending = self._pending()
+        self._local.pending = None
+        return pending or None
+
+    def write(self, pending, after_response=False):
+        """
+        Write saves returned by detach(), on any thread. Failures are
+        logged, not raised, since the response has already been produced.
+
+        after_response is whether the response has already been sent;
+        only then is the time the writes took latency saved. Returns the
+        request envelopes of the saves that failed, whose users a cache
+        in front of this adapter must stop serving from memory.
+        """
+        start = time.perf_counter()
+        failed = []
+        for key, (request_envelope, attributes) in pending.items():
+            try:
+                self.adapter.save_attributes(
+                    request_envelope=request_envelope, attributes=attributes)
+            except Exception:
+                logger.error("Write-behind save failed for {}".format(key),
+                             exc_info=True)
+                failed.append(request_envelope)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        saved_ms = elapsed_ms if after_response else 0.0
+        with self._lock:
+            self.writes += len(pending)
+            self.failures += len(failed)
+            self.write_ms += elapsed_ms
+            self.saved_ms += saved_ms
+        logger.info("Write-behind wrote {} user(s) in {:.1f} ms {} the "
+                    "response, {:.1f} ms saved".format(
+                        len(pending), elapsed_ms,
+                        "after" if after_response else "before", saved_ms))
+        return failed
+
+    def flush(self):
+        """
+        Write every queued save now, before the response is returned.
+        Returns the request envelopes of the saves that failed.
+        """
+        pending = self.detach()
+        return self.write(pending) if pending else []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "writes": self.writes,
+                "coalesced": self.coalesced,
+                "sync_writes": self.sync_writes,
+                "failures": self.failures,
+                "write_ms": self.write_ms,
+                "saved_ms": self.saved_ms,
+            }
+
+
+def find_layer(adapter, attribute):
+    """
+    Return the first adapter in a chain of wrappers (linked by .adapter)
+    that has attribute, or None.
+    """
+    while adapter is not None:
+        if hasattr(adapter, attribute):
+            return adapter
+        adapter = getattr(adapter, "adapter", None)
+    return None
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher(object):
+    """
+    Small thread pool for lookups that don't depend on the persistent
+    attributes, so they can run while those are being loaded.
+
+    A request interceptor submits the lookup and stores the future in the
+    request attributes; the handler takes the result when it needs it.
+    The pool is created on first use and shared by all requests.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="prefetch")
+        return self._executor
+
+    def submit(self, func, *args, **kwargs):
+        return self.executor.submit(func, *args, **kwargs)
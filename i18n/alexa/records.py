@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# Compact encoding of the persisted user record.
+#
+# Version 1 layout, big endian:
+#
+#   version  u8   RECORD_VERSION
+#   flags    u8   HAS_BIRTHDAY when the next three fields are set
+#   year     u16
+#   month    u8   1-12
+#   day      u8   1-31
+#   rest          the remaining attributes (timezones, ...) as compact
+#                 UTF-8 JSON, empty when there are none
+#
+# Records written before this format are JSON objects. They start with
+# "{", which can never be a version byte, so they are still read and are
+# rewritten in the compact format the next time the user's record is
+# saved.
+#
+# legacy() gives the attributes in the shape those JSON objects had (the
+# birthday as strings, the month as its English name), for writing
+# records that code from before this format can still read.
+
+import json
+import struct
+
+from alexa import countdown
+
+RECORD_VERSION = 1
+HAS_BIRTHDAY = 0x01
+
+BIRTHDAY_KEYS = ("year", "month", "day")
+
+_HEADER = struct.Struct(">BBHBB")
+
+
+def birthday(attributes):
+    """
+    Return (year, month, day) as integers from persistent attributes,
+    whether they hold integers or the strings and spoken month names
+    that older records stored. Raises ValueError if they can't be read.
+    """
+    year, month, day = (attributes[key] for key in BIRTHDAY_KEYS)
+    if type(year) is not int:
+        year = int(year)
+    if type(month) is not int:
+        month = countdown.month_number(month)
+    if type(day) is not int:
+        day = int(day)
+    return year, month, day
+
+
+def normalize(attributes):
+    """
+    Return attributes with the birthday stored as integers, or the
+    attributes unchanged if it is missing or can't be read.
+    """
+    try:
+        year, month, day = birthday(attributes)
+    except (KeyError, ValueError, TypeError):
+        return attributes
+    return dict(attributes, year=year, month=month, day=day)
+
+
+def legacy(attributes):
+    """
+    Return attributes with the birthday as the strings older code
+    expects: year and day as digits, month as an English month name
+    (it indexes calendar.month_abbr with month[:3].title()). Attributes
+    without a readable birthday are returned unchanged.
+    """
+    try:
+        year, month, day = birthday(attributes)
+    except (KeyError, ValueError, TypeError):
+        return attributes
+    if not 1 <= month <= 12:
+        return attributes
+    return dict(attributes, year=str(year),
+                month=countdown.MONTH_NAMES['en'][month - 1], day=str(day))
+
+
+def encode(attributes):
+    """
+    Encode persistent attributes as a version 1 record.
+    """
+    flags, year, month, day = 0, 0, 0, 0
+    rest = dict(attributes)
+    try:
+        year, month, day = birthday(attributes)
+    except (KeyError, ValueError, TypeError):
+        pass
+    else:
+        if 0 <= year <= 0xFFFF and 1 <= month <= 12 and 1 <= day <= 31:
+            flags |= HAS_BIRTHDAY
+            for key in BIRTHDAY_KEYS:
+                del rest[key]
+        else:
+            year, month, day = 0, 0, 0
+
+    body = _HEADER.pack(RECORD_VERSION, flags, year, month, day)
+    if rest:
+        body += json.dumps(
+            rest, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return body
+
+
+def decode(body):
+    """
+    Decode a stored record, compact or legacy JSON, into persistent
+    attributes. Raises ValueError on unknown versions.
+    """
+    if not body:
+        return {}
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if body[:1] == b"{":
+        return normalize(json.loads(body.decode("utf-8")))
+
+    version = body[0]
+    if version != RECORD_VERSION:
+        raise ValueError("unknown record version {}".format(version))
+    _, flags, year, month, day = _HEADER.unpack_from(body)
+    rest = body[_HEADER.size:]
+    attributes = json.loads(rest.decode("utf-8")) if rest else {}
+    if flags & HAS_BIRTHDAY:
+        attributes.update(year=year, month=month, day=day)
+    return attributes
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import json
+from os.path import join
+
+from ask_sdk_core.exceptions import PersistenceException
+from ask_sdk_s3.adapter import S3Adapter, user_id_keygen
+from botocore.exceptions import ClientError
+
+from alexa import records
+
+
+class RevalidatingS3Adapter(S3Adapter):
+    """
+    S3Adapter that exposes object ETags, so a cache in front of it
+    (alexa.persistence.CachingPersistenceAdapter) can revalidate with a
+    conditional GET instead of downloading the object again.
+
+    Objects are written as compact records (see alexa.records) unless
+    compact is False, in which case they are written as JSON in the
+    legacy shape, readable by code from before compact records. Both
+    compact and legacy JSON objects are read.
+    """
+
+    def __init__(self, bucket_name, path_prefix=None, s3_client=None,
+                 object_keygen=user_id_keygen, compact=True):
+        super(RevalidatingS3Adapter, self).__init__(
+            bucket_name, path_prefix=path_prefix, s3_client=s3_client,
+            object_keygen=object_keygen)
+        self.compact = compact
+
+    def _object_id(self, request_envelope):
+        return join(self.path_prefix, self.object_keygen(request_envelope))
+
+    def get_attributes_if_changed(self, request_envelope, etag=None):
+        """
+        Return (attributes, etag). attributes is None if the object still
+        matches etag (S3 answered 304 Not Modified).
+        """
+        params = {"Bucket": self.bucket_name,
+                  "Key": self._object_id(request_envelope)}
+        if etag:
+            params["IfNoneMatch"] = etag
+        try:
+            obj = self.s3_client.get_object(**params)
+        except ClientError as ex:
+            code = ex.response['Error']['Code']
+            if code in ('304', 'NotModified'):
+                return None, etag
+            if code == 'NoSuchKey':
+                return {}, None
+            raise PersistenceException(
+                "Failed to get attributes from s3 bucket. Exception of "
+                "type {} occurred: {}".format(type(ex).__name__, str(ex)))
+
+        try:
+            body = obj.get(self.S3_OBJECT_BODY_NAME)
+            attributes = records.decode(body.read()) if body else {}
+        except Exception as e:
+            raise PersistenceException(
+                "Failed to get attributes from s3 bucket. Exception of "
+                "type {} occurred: {}".format(type(e).__name__, str(e)))
+        return attributes, obj.get('ETag')
+
+    def get_attributes(self, request_envelope):
+        attributes, _ = self.get_attributes_if_changed(request_envelope)
+        return attributes
+
+    def save_attributes(self, request_envelope, attributes):
+        """
+        Save attributes and return the new object's ETag.
+        """
+        if self.compact:
+            body = records.encode(attributes)
+        else:
+            body = json.dumps(records.legacy(attributes))
+        try:
+            response = self.s3_client.put_object(
+                Body=body, Bucket=self.bucket_name,
+                Key=self._object_id(request_envelope))
+        except Exception as e:
+            raise PersistenceException(
+                "Failed to save attributes to s3 bucket. Exception of "
+                "type {} occurred: {}".format(type(e).__name__, str(e)))
+        return response.get('ETag')
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+# (connect, read) timeouts in seconds for Alexa Settings API calls
+TIMEOUT = (
+    float(os.environ.get("SETTINGS_API_CONNECT_TIMEOUT", "1.0")),
+    float(os.environ.get("SETTINGS_API_READ_TIMEOUT", "2.0")),
+)
+
+# transient failures are retried with exponential backoff
+RETRIES = int(os.environ.get("SETTINGS_API_RETRIES", "2"))
+BACKOFF = float(os.environ.get("SETTINGS_API_BACKOFF", "0.1"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# time kept back from the invocation's remaining time to finish the
+# response after the Settings API call
+RESERVE_MS = int(os.environ.get("SETTINGS_API_RESERVE_MS", "500"))
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when the request has no time left for a Settings API call.
+    """
+
+
+def build_session():
+    """
+    Create a requests session with a keep-alive connection pool. Retries
+    are done by get_time_zone, so they can be kept within a deadline.
+    """
+    # requests is only imported once a request needs the Settings API
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# created on first use and kept for the container's lifetime, so TCP/TLS
+# connections are reused across warm invocations
+session = None
+
+
+def get_session():
+    global session
+    if session is None:
+        session = build_session()
+    return session
+
+
+def warm_up(url=None):
+    """
+    Create the session and, if url is given (e.g. the regional Alexa API
+    endpoint), open a pooled connection to it with a HEAD request.
+    """
+    pool = get_session()
+    if url:
+        pool.head(url, timeout=TIMEOUT)
+
+
+def request_deadline(context, reserve_ms=RESERVE_MS):
+    """
+    Return the time.monotonic() by which Settings API calls made for the
+    invocation of context must be done, or None if context (the Lambda
+    context) doesn't tell how much time is left.
+    """
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return time.monotonic() + (
+        context.get_remaining_time_in_millis() - reserve_ms) / 1000.0
+
+
+def _time_left(deadline):
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("No time left for the Settings API")
+    return left
+
+
+def get_time_zone(api_endpoint, device_id, api_access_token, deadline=None):
+    """
+    Return the time zone name configured for the device, e.g. "Europe/Paris".
+
+    Connection errors, timeouts, 429 and 5xx answers are retried RETRIES
+    times. With a deadline (see request_deadline) the attempts and the
+    waits between them are cut short to end by it, and DeadlineExceeded
+    is raised once it has passed.
+    """
+    from requests.exceptions import ConnectionError, Timeout
+
+    url = '{api_endpoint}/v2/devices/{device_id}/settings/System.timeZone'.format(
+        api_endpoint=api_endpoint, device_id=device_id)
+    headers = {'Authorization': 'Bearer ' + api_access_token}
+
+    pool = get_session()
+    for attempt in range(RETRIES + 1):
+        if attempt:
+            delay = BACKOFF * 2 ** (attempt - 1)
+            left = _time_left(deadline)
+            if left is not None and left <= delay:
+                raise DeadlineExceeded("No time left to retry the Settings API")
+            time.sleep(delay)
+        left = _time_left(deadline)
+        timeout = TIMEOUT if left is None else (
+            min(TIMEOUT[0], left), min(TIMEOUT[1], left))
+        try:
+            r = pool.get(url, headers=headers, timeout=timeout)
+        except (ConnectionError, Timeout):
+            if attempt == RETRIES:
+                raise
+            continue
+        if r.status_code in RETRY_STATUSES and attempt < RETRIES:
+            continue
+        r.raise_for_status()
+        return r.json()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight(object):
+    """
+    Runs at most one call per key at a time. Callers that ask for a key
+    while its call is in flight wait for that call and share its result,
+    or its exception, instead of making their own.
+
+    Waiting is bounded: a caller given a timeout raises TimeoutError
+    when the call hasn't finished by then, and the call goes on for the
+    others. Once a call finishes the next caller for the key starts a
+    new one, nothing is cached here.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func, timeout=None):
+        """
+        Return func(), or the result of the call in flight for key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return call.result(timeout)
+
+        try:
+            result = func()
+        except BaseException as e:
+            self._done(key)
+            call.set_exception(e)
+            raise
+        self._done(key)
+        call.set_result(result)
+        return result
+
+    def _done(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def __contains__(self, key):
+        """
+        Whether a call for key is in flight.
+        """
+        with self._lock:
+            return key in self._calls
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+
+from ask_sdk_core.attributes_manager import AttributesManager
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_core.serialize import DefaultSerializer
+from ask_sdk_model import IntentRequest, RequestEnvelope
+
+logger = logging.getLogger("main")
+
+
+def copy_json(value):
+    """
+    Copy the dicts and lists of a serialized (JSON) value; the leaves
+    are immutable and shared.
+    """
+    if type(value) is dict:
+        return {key: copy_json(item) for key, item in value.items()}
+    if type(value) is list:
+        return [copy_json(item) for item in value]
+    return value
+
+
+class PrerenderingSerializer(DefaultSerializer):
+    """
+    DefaultSerializer that returns a copy of a stored serialized form
+    for objects registered with remember(), instead of walking their
+    attributes. Copying the containers is much cheaper than serializing
+    the model again, and callers may modify what they get.
+    """
+
+    def __init__(self):
+        super(PrerenderingSerializer, self).__init__()
+        self._prerendered = {}
+
+    def remember(self, obj):
+        """
+        Serialize obj now and return the stored form from now on.
+        """
+        serialized = super(PrerenderingSerializer, self).serialize(obj)
+        # keep obj referenced, so its id can't be reused by another object
+        self._prerendered[id(obj)] = (obj, serialized)
+        return serialized
+
+    def forget(self, obj):
+        self._prerendered.pop(id(obj), None)
+
+    def serialize(self, obj):
+        hit = self._prerendered.get(id(obj))
+        if hit is not None and hit[0] is obj:
+            return copy_json(hit[1])
+        return super(PrerenderingSerializer, self).serialize(obj)
+
+
+class ResponseTemplates(object):
+    """
+    Responses of handlers whose output only depends on the locale
+    (welcome, help, goodbye, the generic error), built once per
+    (handler, locale) and returned as is afterwards, already serialized.
+
+    static() wraps a handler method the way Tracer.instrument does. The
+    first call for a locale runs it and keeps the Response, with its
+    serialized form registered in the serializer; later calls return
+    that Response without running the response builder, and the skill
+    serializer returns a copy of the stored JSON. Templates are rebuilt
+    when the locale's catalog is no longer the one they were built from
+    (CatalogRegistry cleared, reloaded or evicted).
+
+    prerender() builds the templates of every locale, e.g. at warm-up.
+    """
+
+    def __init__(self, catalogs, serializer=None):
+        self.catalogs = catalogs
+        self.serializer = serializer or PrerenderingSerializer()
+        self._templates = {}
+        self._handlers = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def static(self, handler, method="handle"):
+        """
+        Serve handler.method(handler_input) from templates. Returns
+        handler.
+        """
+        build = getattr(handler, method)
+        name = type(handler).__name__
+
+        def templated(handler_input):
+            translate = handler_input.attributes_manager \
+                .request_attributes.get("_")
+            # the bound gettext of the request's catalog
+            catalog = getattr(translate, "__self__", None)
+            if catalog is None:
+                return build(handler_input)
+            key = (name, handler_input.request_envelope.request.locale)
+            entry = self._templates.get(key)
+            if entry is not None and entry[0] is catalog:
+                with self._lock:
+                    self.hits += 1
+                return entry[1]
+            response = build(handler_input)
+            self._store(key, catalog, response)
+            return response
+
+        setattr(handler, method, templated)
+        self._handlers.append((name, build))
+        return handler
+
+    def _store(self, key, catalog, response):
+        serializer = self.serializer
+        with self._lock:
+            old = self._templates.get(key)
+            if old is not None:
+                for obj in old[2]:
+                    serializer.forget(obj)
+            # also the speech objects, which CacheSpeechForRepeatInterceptor
+            # puts into the session attributes
+            objects = [obj for obj in (
+                response, response.output_speech, response.reprompt)
+                if obj is not None]
+            for obj in objects:
+                serializer.remember(obj)
+            self._templates[key] = (catalog, response, objects)
+            self.builds += 1
+
+    def prerender(self, locales=None):
+        """
+        Build the templates of every static handler for locales (default:
+        every locale with a catalog). Returns the number built.
+        """
+        locales = self.catalogs.available_locales() \
+            if locales is None else locales
+        built = 0
+        for locale in locales:
+            translate = self.catalogs.gettext(locale)
+            for name, build in self._handlers:
+                envelope = RequestEnvelope(
+                    request=IntentRequest(locale=locale))
+                handler_input = HandlerInput(
+                    request_envelope=envelope,
+                    attributes_manager=AttributesManager(envelope))
+                handler_input.attributes_manager.request_attributes["_"] = \
+                    translate
+                self._store((name, locale), translate.__self__,
+                            build(handler_input))
+                built += 1
+        return built
+
+    def clear(self):
+        with self._lock:
+            for _, _, objects in self._templates.values():
+                for obj in objects:
+                    self.serializer.forget(obj)
+            self._templates.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "builds": self.builds,
+                "size": len(self._templates),
+            }
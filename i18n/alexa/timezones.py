@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from alexa.singleflight import SingleFlight
+
+logger = logging.getLogger("main")
+
+# zone name -> pytz tzinfo, zone names are a small closed set
+_zones = {}
+# zone name -> (local date, unix time of the next local midnight)
+_today = {}
+
+
+def get_zone(name):
+    """
+    Return the pytz tzinfo for name, resolving each name only once.
+    """
+    try:
+        return _zones[name]
+    except KeyError:
+        # pytz loads its zone list on import, so only pay for it when a
+        # handler needs a zone
+        import pytz
+        zone = _zones[name] = pytz.timezone(name)
+        return zone
+
+
+def local_today(name, now=None):
+    """
+    Return today's date in zone name. The date is cached until the next
+    local midnight, so steady state costs one clock read and a dict lookup.
+    """
+    now = time.time() if now is None else now
+    cached = _today.get(name)
+    if cached is not None and now < cached[1]:
+        return cached[0]
+
+    zone = get_zone(name)
+    today = datetime.fromtimestamp(now, zone).date()
+    midnight = zone.localize(
+        datetime.combine(today + timedelta(days=1), datetime.min.time()))
+    _today[name] = (today, midnight.timestamp())
+    return today
+
+
+class TimeZoneCache(object):
+    """
+    In-process LRU of device time zones with a TTL.
+
+    Fresh entries are served straight from memory. Entries older than the
+    TTL are still served immediately, and refreshed in a background thread
+    (stale-while-revalidate). If the Settings API fails, the last known
+    zone keeps being served instead of failing the request.
+
+    Concurrent lookups for the same device (bursts in a long-lived
+    server process) share one Settings API call, see SingleFlight.
+
+    On Lambda the refresh thread is frozen with the container once the
+    response is returned, and simply finishes on a later invocation.
+    """
+
+    def __init__(self, ttl=24 * 60 * 60, maxsize=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, device_id, fetch, last_known=None, timeout=None):
+        """
+        Return the time zone for device_id.
+
+        fetch is a zero-argument callable that asks the Settings API.
+        last_known is a zone remembered elsewhere (e.g. in persistent
+        attributes); on a cold cache it is served right away and
+        revalidated in the background. Raises whatever fetch raises only
+        when there is no zone to fall back to, and TimeoutError when
+        another request's fetch for the device is still running after
+        timeout seconds.
+        """
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is not None:
+                self._entries.move_to_end(device_id)
+                zone, fetched_at = entry
+                if self.clock() - fetched_at < self.ttl:
+                    self.hits += 1
+                    return zone
+                self.stale_hits += 1
+            elif last_known:
+                self.stale_hits += 1
+                zone = last_known
+            else:
+                self.misses += 1
+                zone = None
+
+        if zone is not None:
+            self._refresh_in_background(device_id, fetch)
+            return zone
+
+        return self._fetch(device_id, fetch, timeout)
+
+    def _fetch(self, device_id, fetch, timeout=None):
+        def load():
+            zone = fetch()
+            self.put(device_id, zone)
+            return zone
+        return self._flights.do(device_id, load, timeout)
+
+    def __contains__(self, device_id):
+        """
+        Whether get() can answer for device_id without waiting on fetch.
+        """
+        with self._lock:
+            return device_id in self._entries
+
+    def put(self, device_id, zone):
+        with self._lock:
+            self._entries[device_id] = (zone, self.clock())
+            self._entries.move_to_end(device_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _refresh_in_background(self, device_id, fetch):
+        with self._lock:
+            if device_id in self._refreshing:
+                return
+            self._refreshing.add(device_id)
+
+        thread = threading.Thread(
+            target=self._refresh, args=(device_id, fetch), daemon=True)
+        thread.start()
+
+    def _refresh(self, device_id, fetch):
+        try:
+            self._fetch(device_id, fetch)
+        except Exception:
+            # keep serving the last known zone
+            with self._lock:
+                self.errors += 1
+            logger.info("Time zone refresh failed for device", exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(device_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "coalesced": self._flights.shared,
+                "size": len(self._entries),
+            }
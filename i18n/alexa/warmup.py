@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# Warm-up requests for provisioned concurrency and scheduled warmers.
+#
+# A warm-up event is {"warmup": true}, e.g. the constant input of an
+# EventBridge schedule. Alexa request envelopes always carry "request",
+# so the two can't be confused. lambda_handler answers warm-up events
+# by running every registered step (loading storage clients, catalogs,
+# time zones, the HTTP pool) and returns how long each one took, instead
+# of dispatching to the skill.
+
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("main")
+
+WARMUP_KEY = "warmup"
+
+
+def is_warmup_event(event):
+    return isinstance(event, dict) and bool(event.get(WARMUP_KEY)) \
+        and "request" not in event
+
+
+class WarmUp(object):
+    """
+    Named warm-up steps, run in registration order. A failing step is
+    reported in the result and doesn't stop the others.
+    """
+
+    def __init__(self):
+        self.steps = OrderedDict()
+        self.runs = 0
+
+    def step(self, name):
+        """
+        Decorator registering func as the warm-up step called name.
+        """
+        def register(func):
+            self.steps[name] = func
+            return func
+        return register
+
+    def run(self):
+        """
+        Run every step and return {"warmup": True, "first_run": bool,
+        "timings_ms": {step: ms}, "errors": {step: message},
+        "total_ms": ms}.
+        """
+        start = time.perf_counter()
+        timings, errors = OrderedDict(), {}
+        for name, func in self.steps.items():
+            step_start = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                errors[name] = "{}: {}".format(type(e).__name__, e)
+                logger.warning("Warm-up step {} failed".format(name),
+                               exc_info=True)
+            timings[name] = round(
+                (time.perf_counter() - step_start) * 1000, 3)
+
+        result = {
+            WARMUP_KEY: True,
+            "first_run": self.runs == 0,
+            "timings_ms": timings,
+            "errors": errors,
+            "total_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+        self.runs += 1
+        logger.info("Warm-up: {}".format(result))
+        return result
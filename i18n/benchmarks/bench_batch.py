@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+# Times the vectorized countdown in alexa.batch at 1M and 10M users, and
+# compares it with calling the per-user alexa.countdown logic in a loop
+# (measured on a sample and extrapolated).
+#
+# Usage, from the i18n directory:
+#   python -m benchmarks.bench_batch [size ...]
+
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from alexa import batch, countdown
+
+SAMPLE = 100000
+
+
+def make_users(size, seed=0):
+    rng = np.random.default_rng(seed)
+    month = rng.integers(1, 13, size, dtype=np.int32)
+    day = np.minimum(rng.integers(1, 32, size, dtype=np.int32),
+                     np.array(countdown._DAYS_IN_MONTH, dtype=np.int32)[month])
+    year = rng.integers(1930, 2020, size, dtype=np.int32)
+    utc_offset = rng.integers(-48, 57, size, dtype=np.int32) * 15 * 60
+    return year, month, day, utc_offset
+
+
+def per_user(year, month, day, utc_offset, now):
+    for y, m, d, off in zip(year.tolist(), month.tolist(), day.tolist(),
+                            utc_offset.tolist()):
+        today = datetime.utcfromtimestamp(now + off).date()
+        countdown.days_until_birthday(y, m, d, today)
+
+
+def main(sizes):
+    now = time.time()
+    for size in sizes:
+        users = make_users(size)
+
+        start = time.perf_counter()
+        batch.days_until_birthday(*users, now=now)
+        vectorized = time.perf_counter() - start
+
+        sample = [column[:SAMPLE] for column in users]
+        start = time.perf_counter()
+        per_user(*sample, now=now)
+        looped = (time.perf_counter() - start) * size / len(sample[0])
+
+        print('{:>11,} users  vectorized {:7.3f} s  per-user loop ~{:8.2f} s'
+              '  ({:.0f}x)'.format(size, vectorized, looped,
+                                   looped / vectorized))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000000, 10000000])
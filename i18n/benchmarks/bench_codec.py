@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# Compares the SDK's request / response (de)serialization with
+# alexa.codec.FastSerializer, per envelope size. Each round trip turns a
+# CaptureBirthdayIntent event into a RequestEnvelope, reads the fields
+# the Cake Time handlers read, and serializes a response that echoes the
+# session attributes, as the skill does. Envelopes are grown with
+# session attributes, supported interfaces, a viewport and slot
+# resolutions, the parts Alexa sends and the handlers don't read.
+#
+# Usage, from the i18n directory:
+#   python -m benchmarks.bench_codec
+#   python -m benchmarks.bench_codec --sizes 1 8 64
+
+import argparse
+import json
+import os
+import timeit
+from copy import deepcopy
+
+from ask_sdk_core.response_helper import ResponseFactory
+from ask_sdk_core.serialize import DefaultSerializer
+from ask_sdk_model import RequestEnvelope, ResponseEnvelope
+
+from alexa.codec import FastSerializer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, "replay_corpus.jsonl")
+
+
+def base_event():
+    with open(CORPUS, encoding="utf-8") as corpus_file:
+        for line in corpus_file:
+            record = json.loads(line)
+            if record["kind"] == "capture_birthday":
+                return record["envelope"]
+
+
+def grow(event, kib):
+    """
+    Return a copy of event padded to about kib KiB of JSON.
+    """
+    event = deepcopy(event)
+    system = event["context"]["System"]
+    system["device"]["supportedInterfaces"] = {
+        "Alexa.Presentation.APL": {"runtime": {"maxVersion": "1.9"}},
+        "AudioPlayer": {}, "Display": {"templateVersion": "1.0",
+                                       "markupVersion": "1.0"}}
+    event["context"]["Viewport"] = {
+        "experiences": [{"arcMinuteWidth": 246, "arcMinuteHeight": 144,
+                         "canRotate": False, "canResize": False}],
+        "mode": "HUB", "shape": "RECTANGLE", "pixelWidth": 1024,
+        "pixelHeight": 600, "dpi": 160, "currentPixelWidth": 1024,
+        "currentPixelHeight": 600, "touch": ["SINGLE"],
+        "keyboard": ["DIRECTION"]}
+    for slot in event["request"]["intent"]["slots"].values():
+        slot["resolutions"] = {"resolutionsPerAuthority": [{
+            "authority": "amzn1.er-authority.echo-sdk.month",
+            "status": {"code": "ER_SUCCESS_MATCH"},
+            "values": [{"value": {"name": slot["value"], "id": "1"}}]}]}
+    attributes = event["session"]["attributes"]
+    index = 0
+    while len(json.dumps(event)) < kib * 1024:
+        attributes["history{}".format(index)] = {
+            "intent": "CaptureBirthdayIntent", "locale": "en-US",
+            "speech": "<speak>Thanks, I'll remember that you were born "
+                      "January 1 1970.</speak>"}
+        index += 1
+    return event
+
+
+def read_fields(envelope):
+    """
+    Read what the handlers, interceptors and persistence layers read.
+    """
+    request = envelope.request
+    system = envelope.context.system
+    slots = request.intent.slots
+    return (request.object_type, request.intent.name, request.locale,
+            slots["year"].value, slots["month"].value, slots["day"].value,
+            system.user.user_id, system.device.device_id,
+            system.api_endpoint, system.api_access_token,
+            envelope.session.new, dict(envelope.session.attributes))
+
+
+def round_trip(serializer, event):
+    if hasattr(serializer, "load_event"):
+        envelope = serializer.load_event(event)
+    else:
+        envelope = serializer.deserialize(json.dumps(event), RequestEnvelope)
+    session_attributes = read_fields(envelope)[-1]
+    builder = ResponseFactory()
+    builder.speak("Thanks, I'll remember that you were born January 1 1970.")
+    return serializer.serialize(ResponseEnvelope(
+        version="1.0", response=builder.response,
+        session_attributes=session_attributes))
+
+
+def best_us(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) \
+        / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=float, nargs="+",
+                        default=[1, 4, 16, 64], help="envelope sizes in KiB")
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    full, fast = DefaultSerializer(), FastSerializer()
+    base = base_event()
+    print("{:>9} {:>12} {:>12} {:>8}".format(
+        "KiB", "full us", "fast us", "speedup"))
+    for kib in args.sizes:
+        event = grow(base, kib)
+        assert round_trip(full, event) == round_trip(fast, event)
+        # bigger envelopes get fewer rounds, so each size takes similar time
+        number = max(10, int(args.number / max(1, kib / 4)))
+        full_us = best_us(lambda: round_trip(full, event), number, args.repeat)
+        fast_us = best_us(lambda: round_trip(fast, event), number, args.repeat)
+        print("{:>9.1f} {:>12.1f} {:>12.1f} {:>7.1f}x".format(
+            len(json.dumps(event)) / 1024.0, full_us, fast_us,
+            full_us / fast_us))
+
+
+if __name__ == "__main__":
+    main()
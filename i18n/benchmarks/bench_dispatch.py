@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Measures the cost of picking a request handler as the number of
+# registered handlers grows, with the SDK's GenericRequestMapper (asks
+# every can_handle in order) and alexa.dispatch.IndexedRequestMapper.
+#
+# Usage, from the i18n directory:
+#   python -m benchmarks.bench_dispatch
+
+import timeit
+
+from ask_sdk_core.dispatch_components import AbstractRequestHandler
+from ask_sdk_core.handler_input import HandlerInput
+from ask_sdk_core.utils import is_intent_name
+from ask_sdk_model import IntentRequest, Intent, RequestEnvelope
+from ask_sdk_runtime.dispatch_components.request_components import (
+    GenericRequestHandlerChain, GenericRequestMapper)
+
+from alexa.dispatch import IndexedRequestMapper
+
+NUMBER = 20000
+
+
+def make_handler(intent_name):
+    class IntentHandler(AbstractRequestHandler):
+        intent_names = (intent_name,)
+
+        def can_handle(self, handler_input):
+            return is_intent_name(intent_name)(handler_input)
+
+        def handle(self, handler_input):
+            return None
+
+    return IntentHandler()
+
+
+def handler_input(intent_name):
+    envelope = RequestEnvelope(request=IntentRequest(
+        intent=Intent(name=intent_name)))
+    return HandlerInput(request_envelope=envelope)
+
+
+def main():
+    print('{:>9} {:>14} {:>14}'.format('handlers', 'generic us', 'indexed us'))
+    for count in (5, 10, 25, 50, 100):
+        chains = [GenericRequestHandlerChain(make_handler('Intent{}'.format(i)))
+                  for i in range(count)]
+        # worst case for the linear scan: the last registered handler
+        request = handler_input('Intent{}'.format(count - 1))
+        timings = []
+        for mapper in (GenericRequestMapper(chains),
+                       IndexedRequestMapper(chains)):
+            assert mapper.get_request_handler_chain(request) is chains[-1]
+            seconds = timeit.timeit(
+                lambda: mapper.get_request_handler_chain(request),
+                number=NUMBER)
+            timings.append(seconds / NUMBER * 1e6)
+        print('{:>9} {:>14.2f} {:>14.2f}'.format(count, *timings))
+
+
+if __name__ == '__main__':
+    main()
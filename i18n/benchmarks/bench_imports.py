@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+# Cold-start import report and budget check. Imports the Lambda module in
+# fresh interpreters with -X importtime, prints the most expensive
+# modules, and exits with status 1 if the median import time is over
+# budget or a dependency that should be deferred was imported.
+#
+# Usage, from the i18n directory:
+#   python -m benchmarks.bench_imports
+#   python -m benchmarks.bench_imports --path ../final --budget-ms 200
+#
+# tests/test_import_budget.py runs the same check under pytest.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# imported on first use only, see alexa.persistence.storage_adapter,
+# alexa.settings_api and alexa.timezones
+DEFERRED = ("boto3", "botocore", "ask_sdk_s3", "requests", "pytz")
+
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 250))
+
+
+def import_times(module, path):
+    """
+    Import module in a fresh interpreter and return
+    [(name, self_us, cumulative_us)] in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        cwd=path, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="lambda_function")
+    parser.add_argument("--path", default=".")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module, args.path) for _ in range(args.runs)]
+    totals = [dict((name, cumulative) for name, _, cumulative in run)
+              [args.module] / 1000.0 for run in runs]
+    last = runs[-1]
+
+    print("{:>10} {:>10}  module".format("self ms", "cumul ms"))
+    for name, self_us, cumulative_us in sorted(
+            last, key=lambda row: row[2], reverse=True)[:args.top]:
+        print("{:10.1f} {:10.1f}  {}".format(
+            self_us / 1000.0, cumulative_us / 1000.0, name))
+
+    median = statistics.median(totals)
+    print("\n{}: median {:.1f} ms over {} runs, budget {:.1f} ms".format(
+        args.module, median, args.runs, args.budget_ms))
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append("import time over budget")
+    imported = sorted({name.split(".")[0] for name, _, _ in last}
+                      .intersection(DEFERRED))
+    if imported:
+        failures.append("imported at cold start: " + ", ".join(imported))
+    for failure in failures:
+        print("FAIL: " + failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+# Offline replay benchmark for lambda_handler. Replays the recorded
+# envelopes in replay_corpus.jsonl (Launch, returning-user Launch,
+# CaptureBirthdayIntent, Help, Stop and SessionEnded in every published
+# locale) against the skill in --path, with persistence and the device
+# Settings API replaced by in-process stand-ins that can inject latency.
+#
+# Reports requests/sec and p50/p95/p99 latency of the fastest of --repeat
+# runs, and the peak memory allocated per request (tracemalloc, measured
+# in a separate pass so it doesn't skew the timings), and compares them
+# with a JSON baseline.
+#
+# Usage, from the i18n directory:
+#   python -m benchmarks.bench_replay
+#   python -m benchmarks.bench_replay --path ../final
+#   python -m benchmarks.bench_replay --storage-latency-ms 15 \
+#       --settings-latency-ms 40 --no-baseline
+#   python -m benchmarks.bench_replay --write-baseline
+#
+# Exits with status 1 when a metric is worse than the baseline by more
+# than --tolerance (default 50%, timings vary that much between runs on
+# shared machines). Baselines are machine specific, regenerate them with
+# --write-baseline on the machine that runs the comparison.
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from copy import deepcopy
+
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, "replay_corpus.jsonl")
+BASELINES = os.path.join(HERE, "baselines")
+
+# metric -> True if higher is better
+METRICS = OrderedDict([
+    ("requests_per_second", True),
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("alloc_kib_per_request", False),
+])
+
+# time zone the Settings API stand-in returns, by API endpoint region
+ZONES = {
+    "https://api.amazonalexa.com": "America/New_York",
+    "https://api.eu.amazonalexa.com": "Europe/Paris",
+    "https://api.fe.amazonalexa.com": "Asia/Tokyo",
+}
+
+
+def sleep_ms(ms):
+    if ms:
+        time.sleep(ms / 1000.0)
+
+
+class StandInStorage(AbstractPersistenceAdapter):
+    """
+    In-memory persistence keyed by user id, with latency per call.
+    """
+
+    def __init__(self, latency_ms=0, records=None):
+        self.latency_ms = latency_ms
+        self.records = dict(records or {})
+        self.gets = 0
+        self.puts = 0
+
+    def get_attributes(self, request_envelope):
+        sleep_ms(self.latency_ms)
+        self.gets += 1
+        return deepcopy(self.records.get(
+            request_envelope.context.system.user.user_id, {}))
+
+    def save_attributes(self, request_envelope, attributes):
+        sleep_ms(self.latency_ms)
+        self.puts += 1
+        self.records[request_envelope.context.system.user.user_id] = \
+            deepcopy(dict(attributes))
+
+    def delete_attributes(self, request_envelope):
+        sleep_ms(self.latency_ms)
+        self.records.pop(request_envelope.context.system.user.user_id, None)
+
+
+class StandInResponse(object):
+    status_code = 200
+
+    def __init__(self, zone):
+        self.zone = zone
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.zone
+
+
+class StandInSession(object):
+    """
+    Replaces the requests session used for the Settings API.
+    """
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        sleep_ms(self.latency_ms)
+        self.calls += 1
+        return StandInResponse(ZONES.get(
+            url.split("/v2/", 1)[0], "America/New_York"))
+
+    def head(self, url, timeout=None):
+        return StandInResponse(None)
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding="utf-8") as corpus_file:
+        return [json.loads(line) for line in corpus_file if line.strip()]
+
+
+def load_skill(path, storage, session):
+    """
+    Import lambda_function from path with the stand-ins installed.
+    """
+    path = os.path.abspath(path)
+    os.chdir(path)
+    sys.path.insert(0, path)
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    import lambda_function as skill
+
+    if hasattr(skill, "find_layer"):
+        # i18n: keep the guard and cache layers, swap the storage beneath
+        skill.find_layer(skill.sb.persistence_adapter, "build").factory = \
+            lambda: storage
+    else:
+        skill.sb.persistence_adapter = storage
+    if hasattr(skill, "settings_api"):
+        skill.settings_api.session = session
+    if hasattr(skill, "get_http_session"):
+        skill.http_session = session
+    return skill
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(0, int(math.ceil(p / 100.0 * len(ordered))) - 1)]
+
+
+def replay(handler, corpus, iterations):
+    """
+    Return {kind: [latency in seconds]} for iterations passes over corpus.
+    """
+    latencies = OrderedDict((record["kind"], []) for record in corpus)
+    clock = time.perf_counter
+    for _ in range(iterations):
+        for record in corpus:
+            start = clock()
+            handler(record["envelope"], None)
+            latencies[record["kind"]].append(clock() - start)
+    return latencies
+
+
+def allocations(handler, corpus):
+    """
+    Return the mean peak KiB allocated per request over one pass.
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        for record in corpus:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            handler(record["envelope"], None)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1024.0
+
+
+def summarize(latencies, elapsed, alloc_kib):
+    every = [value for values in latencies.values() for value in values]
+    result = OrderedDict([
+        ("requests", len(every)),
+        ("requests_per_second", round(len(every) / elapsed, 1)),
+        ("p50_ms", round(percentile(every, 50) * 1000, 3)),
+        ("p95_ms", round(percentile(every, 95) * 1000, 3)),
+        ("p99_ms", round(percentile(every, 99) * 1000, 3)),
+        ("alloc_kib_per_request", round(alloc_kib, 1)),
+    ])
+    result["p50_ms_by_kind"] = OrderedDict(
+        (kind, round(percentile(values, 50) * 1000, 3))
+        for kind, values in latencies.items())
+    return result
+
+
+def compare(result, baseline, tolerance):
+    """
+    Return a list of regressions against baseline.
+    """
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        if metric not in baseline:
+            continue
+        old, new = baseline[metric], result[metric]
+        if higher_is_better:
+            worse = new < old * (1 - tolerance)
+        else:
+            worse = new > old * (1 + tolerance)
+        if worse:
+            regressions.append("{}: {} -> {}".format(metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default=".")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--storage-latency-ms", type=float, default=0)
+    parser.add_argument("--settings-latency-ms", type=float, default=0)
+    parser.add_argument("--baseline")
+    parser.add_argument("--no-baseline", action="store_true")
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--log", action="store_true",
+                        help="keep the skill's logging on")
+    args = parser.parse_args()
+
+    name = os.path.basename(os.path.abspath(args.path))
+    baseline_path = os.path.abspath(args.baseline or os.path.join(
+        BASELINES, "replay-{}.json".format(name)))
+
+    corpus = load_corpus()
+    storage = StandInStorage(args.storage_latency_ms, {
+        record["envelope"]["context"]["System"]["user"]["userId"]:
+            record["stored"]
+        for record in corpus if "stored" in record})
+    session = StandInSession(args.settings_latency_ms)
+    skill = load_skill(args.path, storage, session)
+    if not args.log:
+        logging.getLogger("main").disabled = True
+
+    replay(skill.lambda_handler, corpus, args.warmup)
+    # best of --repeat runs, like timeit, to keep machine noise out
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        latencies = replay(skill.lambda_handler, corpus, args.iterations)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[1]:
+            best = latencies, elapsed
+    result = summarize(
+        best[0], best[1], allocations(skill.lambda_handler, corpus))
+    result["config"] = OrderedDict([
+        ("skill", name),
+        ("iterations", args.iterations),
+        ("storage_latency_ms", args.storage_latency_ms),
+        ("settings_latency_ms", args.settings_latency_ms),
+    ])
+    result["storage_gets"] = storage.gets
+    result["storage_puts"] = storage.puts
+    result["settings_api_calls"] = session.calls
+    print(json.dumps(result, indent=2))
+
+    if args.write_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as baseline_file:
+            json.dump(result, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print("wrote " + baseline_path)
+        return 0
+    if args.no_baseline or not os.path.exists(baseline_path):
+        return 0
+
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get("config") != result["config"]:
+        print("baseline was recorded with {}, not comparing".format(
+            dict(baseline.get("config", {}))))
+        return 0
+    regressions = compare(result, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
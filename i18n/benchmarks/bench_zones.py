@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+# Compares the per-request cost of working out "today" in the user's zone,
+# before (building a pytz zone from its name and calling datetime.now) and
+# after (alexa.timezones.local_today).
+#
+# Usage, from the i18n directory:
+#   python -m benchmarks.bench_zones
+
+import timeit
+from datetime import datetime
+
+from pytz import timezone, common_timezones
+
+from alexa.timezones import local_today
+
+ZONES = common_timezones[::12]
+NUMBER = 100000
+
+
+def before(name):
+    now_time = datetime.now(timezone(name))
+    return datetime(now_time.year, now_time.month, now_time.day)
+
+
+def after(name):
+    today = local_today(name)
+    return datetime(today.year, today.month, today.day)
+
+
+def run(func):
+    names = ZONES * (NUMBER // len(ZONES))
+    seconds = timeit.timeit(
+        'for name in names: func(name)', number=1,
+        globals={'names': names, 'func': func})
+    return seconds / len(names) * 1e6
+
+
+def main():
+    for func in (before, after):
+        func(ZONES[0])  # warm up
+        print('{:<8} {:8.2f} us/request over {} zones'.format(
+            func.__name__, run(func), len(ZONES)))
+
+
+if __name__ == '__main__':
+    main()
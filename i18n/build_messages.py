@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+# Compiles locales/*/LC_MESSAGES/data.po into alexa/messages.py, so the
+# skill can look up translations with a dict access instead of opening and
+# parsing .mo files at runtime. The .mo files are rebuilt as well, they are
+# still used for locales missing from alexa/messages.py.
+#
+# Usage:
+#   python build_messages.py          regenerate alexa/messages.py and *.mo
+#   python build_messages.py --check  fail if data.pot, the .po/.mo files,
+#                                     alexa/data.py or alexa/messages.py
+#                                     disagree (use this in CI / before deploy)
+
+import argparse
+import ast
+import gettext
+import glob
+import os
+import struct
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LOCALE_DIR = os.path.join(HERE, 'locales')
+DOMAIN = 'data'
+POT_FILE = os.path.join(LOCALE_DIR, DOMAIN + '.pot')
+OUTPUT_FILE = os.path.join(HERE, 'alexa', 'messages.py')
+
+HEADER = """# -*- coding: utf-8 -*-
+
+# Generated by build_messages.py from locales/*/LC_MESSAGES/data.po.
+# Do not edit by hand, run `python build_messages.py` instead.
+
+"""
+
+
+def parse_po(path):
+    """
+    Parse a .po/.pot file into a dict of msgid -> msgstr, in file order.
+    The header is kept under the empty msgid, fuzzy entries are skipped
+    like msgfmt does.
+    """
+    entries = {}
+    msgid = msgstr = current = None
+    fuzzy = next_fuzzy = False
+
+    def flush():
+        if msgid is not None and not fuzzy:
+            entries[msgid] = msgstr or ''
+
+    with open(path, encoding='utf-8', errors='replace') as po:
+        for line in po:
+            line = line.strip()
+            if line.startswith('#,') and 'fuzzy' in line:
+                next_fuzzy = True
+            elif line.startswith('msgid '):
+                flush()
+                msgid, msgstr, current = ast.literal_eval(line[6:]), None, 'msgid'
+                fuzzy, next_fuzzy = next_fuzzy, False
+            elif line.startswith('msgstr '):
+                msgstr, current = ast.literal_eval(line[7:]), 'msgstr'
+            elif line.startswith('"'):
+                if current == 'msgid':
+                    msgid += ast.literal_eval(line)
+                elif current == 'msgstr':
+                    msgstr += ast.literal_eval(line)
+        flush()
+    return entries
+
+
+def source_messages():
+    """
+    Return the set of message ids declared in alexa/data.py.
+    """
+    sys.path.insert(0, HERE)
+    from alexa import data
+    return {
+        value for name, value in vars(data).items()
+        if not name.startswith('_') and isinstance(value, str)
+    }
+
+
+def po_files():
+    pattern = os.path.join(LOCALE_DIR, '*', 'LC_MESSAGES', DOMAIN + '.po')
+    return {
+        os.path.basename(os.path.dirname(os.path.dirname(path))): path
+        for path in sorted(glob.glob(pattern))
+    }
+
+
+def compile_catalogs():
+    """
+    Return {locale: {msgid: msgstr}} for every .po file. Untranslated
+    messages are left out so lookups fall back to the msgid.
+    """
+    return {
+        locale: {k: v for k, v in parse_po(path).items() if k and v}
+        for locale, path in po_files().items()
+    }
+
+
+def render(catalogs):
+    lines = [HEADER, 'CATALOGS = {\n']
+    for locale, messages in sorted(catalogs.items()):
+        lines.append('    {!r}: {{\n'.format(locale))
+        for msgid, msgstr in messages.items():
+            lines.append('        {!r}:\n            {!r},\n'.format(msgid, msgstr))
+        lines.append('    },\n')
+    lines.append('}\n')
+    return ''.join(lines)
+
+
+def write_mo(entries, path):
+    """
+    Write entries (including the header) as a GNU .mo file, the same
+    layout msgfmt produces.
+    """
+    messages = sorted(
+        (k.encode('utf-8'), v.encode('utf-8'))
+        for k, v in entries.items() if v)
+    ids = strs = b''
+    offsets = []
+    for msgid, msgstr in messages:
+        offsets.append((len(ids), len(msgid), len(strs), len(msgstr)))
+        ids += msgid + b'\0'
+        strs += msgstr + b'\0'
+
+    count = len(messages)
+    ids_start = 7 * 4 + count * 16
+    strs_start = ids_start + len(ids)
+    id_table, str_table = [], []
+    for id_off, id_len, str_off, str_len in offsets:
+        id_table += [id_len, ids_start + id_off]
+        str_table += [str_len, strs_start + str_off]
+
+    with open(path, 'wb') as mo:
+        mo.write(struct.pack(
+            'Iiiiiii', 0x950412de, 0, count,
+            7 * 4, 7 * 4 + count * 8, 0, 0))
+        mo.write(struct.pack('{}i'.format(len(id_table)), *id_table))
+        mo.write(struct.pack('{}i'.format(len(str_table)), *str_table))
+        mo.write(ids)
+        mo.write(strs)
+
+
+def check():
+    """
+    Return a list of drift errors between data.py, data.pot, the .po/.mo
+    files and the generated module.
+    """
+    errors = []
+    source = source_messages()
+    template = set(parse_po(POT_FILE)) - {''}
+
+    for msgid in sorted(source - template):
+        errors.append('data.pot is missing {!r} from alexa/data.py'.format(msgid))
+    for msgid in sorted(template - source):
+        errors.append('data.pot has {!r}, not in alexa/data.py'.format(msgid))
+
+    for locale, path in po_files().items():
+        entries = parse_po(path)
+        entries.pop('', None)
+        for msgid in sorted(template - set(entries)):
+            errors.append('{}: missing {!r}'.format(locale, msgid))
+        for msgid in sorted(set(entries) - template):
+            errors.append('{}: obsolete {!r}'.format(locale, msgid))
+
+        mo_path = path[:-3] + '.mo'
+        if not os.path.exists(mo_path):
+            errors.append('{}: data.mo is missing'.format(locale))
+            continue
+        with open(mo_path, 'rb') as mo:
+            compiled = gettext.GNUTranslations(mo)._catalog
+        compiled = {k: v for k, v in compiled.items() if k}
+        if compiled != {k: v for k, v in entries.items() if v}:
+            errors.append('{}: data.mo is out of date with data.po'.format(locale))
+
+    expected = render(compile_catalogs())
+    try:
+        with open(OUTPUT_FILE, encoding='utf-8') as generated:
+            if generated.read() != expected:
+                errors.append('alexa/messages.py is out of date')
+    except IOError:
+        errors.append('alexa/messages.py is missing')
+
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compile data.po catalogs into alexa/messages.py.')
+    parser.add_argument('--check', action='store_true',
+                        help='only verify, exit non-zero on drift')
+    args = parser.parse_args(argv)
+
+    if args.check:
+        errors = check()
+        for error in errors:
+            print(error, file=sys.stderr)
+        return 1 if errors else 0
+
+    for path in po_files().values():
+        write_mo(parse_po(path), path[:-3] + '.mo')
+        print('wrote {}'.format(os.path.relpath(path[:-3] + '.mo', HERE)))
+
+    with open(OUTPUT_FILE, 'w', encoding='utf-8') as generated:
+        generated.write(render(compile_catalogs()))
+    print('wrote {}'.format(os.path.relpath(OUTPUT_FILE, HERE)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,35 +6,140 @@
 # implementing slots, dialog management,
 # session persistence, api calls, and more.
 
-import requests
+import os
 import logging
-import calendar
-from datetime import datetime
-from pytz import timezone
-import gettext
+import time
+
+from alexa import countdown, data, records, settings_api
+from alexa.breaker import CircuitBreaker
+from alexa.catalogs import CatalogRegistry
+from alexa.codec import FastSerializer
+from alexa.dispatch import IndexedSkillBuilder
+from alexa.prefetch import Prefetcher
+from alexa.persistence import (
+    CachingPersistenceAdapter, GuardedPersistenceAdapter,
+    WriteBehindPersistenceAdapter, find_layer, save_changes, storage_adapter)
+from alexa.templates import PrerenderingSerializer, ResponseTemplates
+from alexa.timezones import TimeZoneCache, local_today
+from alexa.tracing import Tracer, emit_metrics
+from alexa.warmup import WarmUp, is_warmup_event
 
-from alexa import data
-
-from ask_sdk_s3.adapter import S3Adapter
-from ask_sdk_core.skill_builder import CustomSkillBuilder
 from ask_sdk_core.dispatch_components import (
     AbstractRequestHandler, AbstractExceptionHandler,
     AbstractRequestInterceptor, AbstractResponseInterceptor
 )
 from ask_sdk_core.utils import is_request_type, is_intent_name
 
-s3_adapter = S3Adapter(bucket_name="custom-walk-testing")
-sb = CustomSkillBuilder(persistence_adapter=s3_adapter)
+# spans for a TRACE_SAMPLE_RATE share of requests (0 to 1, off by default)
+# as CloudWatch embedded metrics, or "Trace" log lines with TRACE_OUTPUT=log
+tracer = Tracer(
+    sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE") or 0),
+    output=os.environ.get("TRACE_OUTPUT") or "emf")
+
+# S3 by default, see storage_adapter for PERSISTENCE_BACKEND
+storage = tracer.instrument(storage_adapter(), (
+    "get_attributes", "get_attributes_if_changed", "save_attributes",
+    "delete_attributes"), prefix="persistence")
+if os.environ.get("PERSISTENCE_WRITE_BEHIND", "").lower() == "true":
+    # saves are queued and coalesced, and written once the response is
+    # serialized (Lambda) or after it has been sent (server.py)
+    storage = WriteBehindPersistenceAdapter(storage)
+# returning users are served from memory, revalidated against storage
+# once the entry is older than PERSISTENCE_CACHE_TTL seconds
+cached_adapter = CachingPersistenceAdapter(
+    storage, ttl=int(os.environ.get("PERSISTENCE_CACHE_TTL", 60)))
+# FAST_CODEC=true only converts the parts of the request envelope the
+# handlers read, see alexa/codec.py
+if os.environ.get("FAST_CODEC", "").lower() == "true":
+    serializer = FastSerializer()
+else:
+    serializer = PrerenderingSerializer()
+# only handlers that declare needs_persistence can reach storage
+sb = IndexedSkillBuilder(
+    persistence_adapter=GuardedPersistenceAdapter(cached_adapter),
+    tracer=tracer, serializer=serializer)
 
 logger = logging.getLogger("main")
 logger.setLevel(logging.INFO)
 
+# gettext catalogs are loaded once per warm container and reused
+catalogs = CatalogRegistry(domain='data', localedir='locales')
+
+# responses that only depend on the locale are built and serialized once
+# per catalog, see the handlers registered with responses.static below
+responses = ResponseTemplates(catalogs, sb.serializer)
+
+# device time zones, refreshed from the Settings API at most once a day
+time_zones = TimeZoneCache(
+    ttl=int(os.environ.get("TIMEZONE_CACHE_TTL", 24 * 60 * 60)))
+# also remember each device's zone in the persistent attributes, so the
+# cache survives cold starts
+PERSIST_TIME_ZONES = os.environ.get("PERSIST_TIME_ZONES", "").lower() == "true"
+
+
+def export_transition(breaker, old, new):
+    emit_metrics({"CircuitTransition": 1},
+                 {"Circuit": breaker.name, "State": new}, From=old)
+
+
+# when the Settings API keeps failing or answering slower than
+# SETTINGS_API_SLOW_MS, lookups fail fast for SETTINGS_API_OPEN_SECONDS
+# and devices get their cached zone, or DEFAULT_TIME_ZONE if set
+settings_breaker = CircuitBreaker(
+    "settings_api",
+    failure_rate=float(os.environ.get("SETTINGS_API_FAILURE_RATE", 0.5)),
+    slow_call_ms=float(os.environ.get("SETTINGS_API_SLOW_MS", 1500)),
+    open_seconds=float(os.environ.get("SETTINGS_API_OPEN_SECONDS", 30)),
+    excluded=(settings_api.DeadlineExceeded,),
+    on_transition=export_transition)
+DEFAULT_TIME_ZONE = os.environ.get("DEFAULT_TIME_ZONE")
+
+get_time_zone = settings_breaker.wrap(
+    tracer.wrap("http.settings_api", settings_api.get_time_zone))
+
+# lookups started by request interceptors, see TimeZonePrefetchInterceptor
+prefetcher = Prefetcher()
+
+
+def device_time_zone(sys_object, last_known=None, pending=None,
+                     deadline=None):
+    """
+    Return the time zone of the requesting device. pending is the lookup
+    TimeZonePrefetchInterceptor started, if any; while it is still
+    running, a zone remembered in the persistent attributes is used
+    instead of waiting for it. A Settings API call, or waiting for
+    another request's call for the same device, is given up at deadline
+    (see settings_api.request_deadline).
+    """
+    if pending is not None:
+        if last_known and not pending.done():
+            # the lookup still fills the cache for the next request, it is
+            # settled once the response is out (TimeZonePrefetchInterceptor)
+            return last_known
+        try:
+            return pending.result()
+        except Exception:
+            if not last_known:
+                raise
+            return last_known
+
+    return time_zones.get(
+        sys_object.device.device_id,
+        lambda: get_time_zone(
+            sys_object.api_endpoint, sys_object.device.device_id,
+            sys_object.api_access_token, deadline=deadline),
+        last_known=last_known,
+        timeout=None if deadline is None else max(
+            0, deadline - time.monotonic()))
+
 
 class LaunchRequestIntentHandler(AbstractRequestHandler):
     """
     Handler for Skill Launch
     """
 
+    request_types = ("LaunchRequest",)
+
     def can_handle(self, handler_input):
         return is_request_type("LaunchRequest")(handler_input)
 
@@ -53,6 +158,9 @@ class HasBirthdayLaunchRequestHandler(AbstractRequestHandler):
     Handler for launch after they have set their birthday
     """
 
+    request_types = ("LaunchRequest",)
+    needs_persistence = True
+
     def can_handle(self, handler_input):
         # extract persistent attributes and check if they are all present
         attr = handler_input.attributes_manager.persistent_attributes
@@ -66,71 +174,54 @@ class HasBirthdayLaunchRequestHandler(AbstractRequestHandler):
 
         attr = handler_input.attributes_manager.persistent_attributes
 
-        year = int(attr['year'])
-        # month is a string, and we need to convert it to a month index later
-        month = attr['month']
-        day = int(attr['day'])
+        # integers in compact records, converted once for older ones
+        year, month, day = records.birthday(attr)
 
         # get device id / timezones
         sys_object = handler_input.request_envelope.context.system
-
-        # get systems api information
-        api_endpoint = sys_object.api_endpoint
         device_id = sys_object.device.device_id
-        api_access_token = sys_object.api_access_token
 
-        # construct systems api timezone url
-        url = '{api_endpoint}/v2/devices/{device_id}/settings/System.timeZone'.format(
-            api_endpoint=api_endpoint, device_id=device_id)
-        headers = {'Authorization': 'Bearer ' + api_access_token}
+        known_zones = attr.get('timezones', {})
 
         userTimeZone = ""
+        defaulted = False
         try:
-            r = requests.get(url, headers=headers)
-            res = r.json()
-            logger.info("Device API result: {}".format(str(res)))
-            userTimeZone = res
+            userTimeZone = device_time_zone(
+                sys_object, last_known=known_zones.get(device_id),
+                pending=handler_input.attributes_manager.request_attributes
+                .get("time_zone"),
+                deadline=settings_api.request_deadline(handler_input.context))
+            logger.info("Device time zone: {}".format(str(userTimeZone)))
         except Exception:
-            speech = _(data.ERROR_TIMEZONE_MSG)
-            handler_input.response_builder.speak(speech)
-            return handler_input.response_builder.response
-
-        # getting the current date with the time
-        now_time = datetime.now(timezone(userTimeZone))
-
-        # Removing the time from the date because it affects our difference calculation
-        now_date = datetime(now_time.year, now_time.month, now_time.day)
-        current_year = now_time.year
-
-        # getting the next birthday
-        month_as_index = list(calendar.month_abbr).index(month[:3].title())
-        next_birthday = datetime(current_year, month_as_index, day)
-
-        # check if we need to adjust bday by one year
-        if now_date > next_birthday:
-            next_birthday = datetime(
-                current_year + 1,
-                month_as_index,
-                day
-            )
-            current_year += 1
+            if not DEFAULT_TIME_ZONE:
+                speech = _(data.ERROR_TIMEZONE_MSG)
+                handler_input.response_builder.speak(speech)
+                return handler_input.response_builder.response
+            logger.warning("Time zone lookup failed, using {}".format(
+                DEFAULT_TIME_ZONE), exc_info=True)
+            userTimeZone = DEFAULT_TIME_ZONE
+            defaulted = True
+
+        if PERSIST_TIME_ZONES and not defaulted and \
+                known_zones.get(device_id) != userTimeZone:
+            known_zones = dict(known_zones, **{device_id: userTimeZone})
+            save_changes(
+                handler_input.attributes_manager, {'timezones': known_zones})
+
+        # days until the next birthday in the user's time zone, and the
+        # age they turn on it
+        diff_days, age = countdown.days_until_birthday(
+            year, month, day, local_today(userTimeZone))
+
         # setting the default speak_output to Happy xth Birthday!!
         # alexa will automatically correct the oridinal for you.
         # no need to worry about when to use st, th, rd
-        speak_output = _(data.HAPPY_BIRTHDAY_MSG).format(
-            str(current_year - year))
-        if now_date != next_birthday:
-            diff_days = abs((now_date - next_birthday).days)
-            logger.info(speak_output)
-            speak_output = _(data.WELCOME_BACK_MSG).format(
-                diff_days,
-                (current_year-year)
-            )
+        speak_output = _(data.HAPPY_BIRTHDAY_MSG).format(str(age))
+        if diff_days != 0:
+            speak_output = _(data.WELCOME_BACK_MSG).format(diff_days, age)
             if(diff_days != 1):
                 speak_output = _(data.WELCOME_BACK_MSG_plural).format(
-                    diff_days,
-                    (current_year-year)
-                )
+                    diff_days, age)
 
         handler_input.response_builder.speak(speak_output)
         return handler_input.response_builder.response
@@ -141,6 +232,9 @@ class BirthdayIntentHandler(AbstractRequestHandler):
     Handler for Capturing the Birthday
     """
 
+    intent_names = ("CaptureBirthdayIntent",)
+    needs_persistence = True
+
     def can_handle(self, handler_input):
         return is_intent_name("CaptureBirthdayIntent")(handler_input)
 
@@ -160,9 +254,11 @@ class BirthdayIntentHandler(AbstractRequestHandler):
         session_attr['month'] = month
         session_attr['day'] = day
 
-        # save session attributes as persistent attributes
-        handler_input.attributes_manager.persistent_attributes = session_attr
-        handler_input.attributes_manager.save_persistent_attributes()
+        # save the birthday as persistent attributes, as integers when the
+        # slots can be read, skipping the write when the same birthday is
+        # already stored
+        save_changes(handler_input.attributes_manager, records.normalize(
+            {'year': year, 'month': month, 'day': day}))
 
         date = self.formatDate(year, month, day, locale)
 
@@ -189,6 +285,8 @@ class HelpIntentHandler(AbstractRequestHandler):
     Handler for AMAZON.HelpIntent
     """
 
+    intent_names = ("AMAZON.HelpIntent",)
+
     def can_handle(self, handler_input):
         return is_intent_name("AMAZON.HelpIntent")(handler_input)
 
@@ -213,6 +311,9 @@ class CatchAllExceptionHandler(AbstractExceptionHandler):
 
     def handle(self, handler_input, exception):
         logger.info(exception)
+        return self.error_response(handler_input)
+
+    def error_response(self, handler_input):
         _ = handler_input.attributes_manager.request_attributes["_"]
         speak_output = _(data.ERROR_MSG)
         handler_input.response_builder.speak(speak_output).ask(speak_output)
@@ -224,9 +325,11 @@ class CancelAndStopIntentHandler(AbstractRequestHandler):
     Handler for AMAZON.CancelIntent and AMAZON.StopIntent
     """
 
+    intent_names = ("AMAZON.CancelIntent", "AMAZON.StopIntent")
+
     def can_handle(self, handler_input):
         return is_intent_name("AMAZON.CancelIntent")(handler_input) \
-            and is_intent_name("AMAZON.StopIntent")(handler_input)
+            or is_intent_name("AMAZON.StopIntent")(handler_input)
 
     def handle(self, handler_input):
         _ = handler_input.attributes_manager.request_attributes["_"]
@@ -240,6 +343,8 @@ class SessionEndedRequestHandler(AbstractRequestHandler):
     Handler for SessionEndedRequest
     """
 
+    request_types = ("SessionEndedRequest",)
+
     def can_handle(self, handler_input):
         return is_request_type("SessionEndedRequest")(handler_input)
 
@@ -268,24 +373,134 @@ class LocalizationInterceptor(AbstractRequestInterceptor):
     def process(self, handler_input):
         locale = handler_input.request_envelope.request.locale
         logger.info("Locale is {}".format(locale))
-        i18n = gettext.translation(
-            'data', localedir='locales', languages=[locale], fallback=True)
-        handler_input.attributes_manager.request_attributes["_"] = i18n.gettext
+        handler_input.attributes_manager.request_attributes["_"] = \
+            catalogs.gettext(locale)
+
+
+class TimeZonePrefetchInterceptor(AbstractRequestInterceptor):
+    """
+    Start looking up the device time zone at the beginning of a launch,
+    so the Settings API call runs while HasBirthdayLaunchRequestHandler
+    loads the persistent attributes instead of after it. Devices whose
+    zone is already cached don't need it, nor users this container
+    already knows have no birthday (in the persistence cache); for other
+    new users LaunchRequestIntentHandler answers without waiting for it.
+
+    The lookup is not left running once the request is over: Lambda
+    would freeze it mid-call. It is waited for (up to the request
+    deadline) after the response has been sent where the host allows it
+    (server.py), else before the handler returns.
+    """
+
+    def process(self, handler_input):
+        if not is_request_type("LaunchRequest")(handler_input):
+            return
+        sys_object = handler_input.request_envelope.context.system
+        device = sys_object.device
+        if device is None or device.device_id in time_zones:
+            return
+        known = cached_adapter.peek(handler_input.request_envelope)
+        if known is not None and \
+                not all(k in known for k in ("year", "month", "day")):
+            return
+        deadline = settings_api.request_deadline(handler_input.context)
+        # the lookup's spans belong to this request's trace
+        pending = prefetcher.submit(
+            tracer.bind(device_time_zone), sys_object, deadline=deadline)
+        handler_input.attributes_manager.request_attributes["time_zone"] = \
+            pending
+        sb.after_response(lambda sent: settle(pending, deadline))
+
+
+def settle(pending, deadline=None):
+    """
+    Cancel a prefetched lookup that hasn't started, or wait for it until
+    deadline. Its result is already in time_zones, failures were
+    handled or ignored by the request.
+    """
+    if pending.cancel():
+        return
+    try:
+        pending.result(timeout=None if deadline is None else max(
+            0, deadline - time.monotonic()))
+    except Exception:
+        pass
 
 
 # register request / intent handlers
 sb.add_request_handler(HasBirthdayLaunchRequestHandler())
-sb.add_request_handler(LaunchRequestIntentHandler())
+sb.add_request_handler(responses.static(LaunchRequestIntentHandler()))
 sb.add_request_handler(BirthdayIntentHandler())
-sb.add_request_handler(HelpIntentHandler())
-sb.add_request_handler(CancelAndStopIntentHandler())
+sb.add_request_handler(responses.static(HelpIntentHandler()))
+sb.add_request_handler(responses.static(CancelAndStopIntentHandler()))
 sb.add_request_handler(SessionEndedRequestHandler())
 
 # register exception handlers
-sb.add_exception_handler(CatchAllExceptionHandler())
+sb.add_exception_handler(responses.static(
+    CatchAllExceptionHandler(), "error_response"))
 
-# register localization interceptor and cache speech interceptor
+# register time zone prefetch, localization and cache speech interceptors
+sb.add_global_request_interceptor(TimeZonePrefetchInterceptor())
 sb.add_global_request_interceptor(LocalizationInterceptor())
 sb.add_global_response_interceptor(CacheSpeechForRepeatInterceptor())
 
-lambda_handler = sb.lambda_handler()
+# warm-up events ({"warmup": true}) load everything a first request would,
+# so provisioned concurrency or a scheduled warmer pays for it instead
+warm_up = WarmUp()
+
+
+@warm_up.step("storage")
+def warm_up_storage():
+    adapter = find_layer(sb.persistence_adapter, "build")
+    if adapter is not None:
+        adapter.build()
+
+
+@warm_up.step("catalogs")
+def warm_up_catalogs():
+    catalogs.preload()
+
+
+@warm_up.step("responses")
+def warm_up_responses():
+    responses.prerender()
+
+
+@warm_up.step("time_zones")
+def warm_up_time_zones():
+    for name in os.environ.get("WARMUP_TIME_ZONES", "UTC").split(","):
+        local_today(name.strip())
+
+
+@warm_up.step("settings_api")
+def warm_up_settings_api():
+    settings_api.warm_up(os.environ.get("WARMUP_SETTINGS_API_URL"))
+
+
+@warm_up.step("serializer")
+def warm_up_serializer():
+    # the SDK imports the model classes the first time it deserializes
+    from ask_sdk_core.serialize import DefaultSerializer
+    from ask_sdk_model import RequestEnvelope, ResponseEnvelope
+    serializer = DefaultSerializer()
+    serializer.deserialize(WARMUP_ENVELOPE, RequestEnvelope)
+    serializer.serialize(ResponseEnvelope(version="1.0"))
+
+
+WARMUP_ENVELOPE = """{"version": "1.0",
+ "context": {"System": {"application": {"applicationId": "warmup"},
+                        "user": {"userId": "warmup"},
+                        "device": {"deviceId": "warmup",
+                                   "supportedInterfaces": {}}}},
+ "request": {"type": "IntentRequest", "requestId": "warmup",
+             "locale": "en-US", "timestamp": "2020-01-01T00:00:00Z",
+             "intent": {"name": "CaptureBirthdayIntent", "slots": {
+                 "day": {"name": "day", "value": "1"}}}}}"""
+
+skill_handler = sb.lambda_handler()
+
+
+def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warm_up.run()
+    return skill_handler(event, context)
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+
+# HTTP host for running the skill on our own servers instead of Lambda.
+#
+# An asyncio server accepts Alexa request envelopes (POST, JSON body) and
+# hands them to lambda_function.lambda_handler, the same skill instance
+# and persistence / HTTP clients Lambda uses, on a bounded thread pool.
+# Write-behind persistence writes (PERSISTENCE_WRITE_BEHIND) run after
+# the response has been sent. GET /ping answers health checks. With
+# --workers N the listening socket is opened once and N pre-forked
+# processes serve it.
+#
+# Requests are verified (signature and timestamp) with
+# ask-sdk-webservice-support, which is only needed here and is not part
+# of the Lambda package requirements. --no-verify is for local testing.
+#
+# Usage, from the i18n directory:
+#   python server.py --port 8080 --workers 4
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+logger = logging.getLogger("main")
+
+# Alexa waits 8 seconds for a response
+REQUEST_TIMEOUT = 8.0
+MAX_BODY = 256 * 1024
+
+
+class RequestContext(object):
+    """
+    Stands in for the Lambda context object, so code that budgets work by
+    get_remaining_time_in_millis (write-behind persistence) sees the time
+    left before Alexa gives up on the request.
+
+    Unlike Lambda, the server keeps running once the response is sent:
+    work passed to after_response (write-behind persistence writes) is
+    run then, by SkillServer.
+    """
+
+    def __init__(self, timeout=REQUEST_TIMEOUT, clock=time.monotonic):
+        self.clock = clock
+        self.deadline = clock() + timeout
+        self.callbacks = []
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - self.clock()) * 1000))
+
+    def after_response(self, callback):
+        self.callbacks.append(callback)
+
+    def run_callbacks(self):
+        for callback in self.callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.error("After-response callback failed", exc_info=True)
+
+
+class RequestRejected(Exception):
+    pass
+
+
+class SkillServer(object):
+    """
+    Serves handler(event, context) over HTTP/1.1 with keep-alive.
+
+    Handler calls run on a pool of threads; requests beyond threads +
+    backlog waiting for one are answered 503 instead of queueing without
+    bound.
+    """
+
+    def __init__(self, handler, threads=8, backlog=32, verifiers=(),
+                 path="/", timeout=REQUEST_TIMEOUT):
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="skill")
+        self.slots = threads + backlog
+        self.verifiers = list(verifiers)
+        self.path = path
+        self.timeout = timeout
+        self.in_flight = 0
+        self.closing = False
+        self._idle = None
+        self._server = None
+        self._connections = set()
+
+    async def start(self, sock=None, host="0.0.0.0", port=8080):
+        self._idle = asyncio.Event()
+        self._idle.set()
+        if sock is not None:
+            self._server = await asyncio.start_server(
+                self.handle_connection, sock=sock)
+        else:
+            self._server = await asyncio.start_server(
+                self.handle_connection, host=host, port=port)
+        logger.info("Serving on {}".format(", ".join(
+            str(s.getsockname()) for s in self._server.sockets)))
+
+    async def shutdown(self, grace=REQUEST_TIMEOUT):
+        """
+        Stop accepting connections, wait up to grace seconds for requests
+        in flight, close idle keep-alive connections and stop the thread
+        pool.
+        """
+        self.closing = True
+        logger.info("Shutting down, {} request(s) in flight".format(
+            self.in_flight))
+        self._server.close()
+        try:
+            await asyncio.wait_for(self._idle.wait(), grace)
+        except asyncio.TimeoutError:
+            logger.warning("{} request(s) still running at shutdown".format(
+                self.in_flight))
+        for writer in list(self._connections):
+            writer.close()
+        self.executor.shutdown(wait=True)
+
+    async def handle_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while not self.closing:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, version, headers, body = request
+                context = RequestContext(self.timeout)
+                try:
+                    status, payload = await self.respond(
+                        method, path, headers, body, context)
+                    keep_alive = (
+                        version == "HTTP/1.1" and not self.closing and
+                        headers.get("connection", "").lower() != "close")
+                    write_response(writer, status, payload, keep_alive)
+                    await writer.drain()
+                finally:
+                    # also when the client has gone away
+                    await self.after_response(context)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def respond(self, method, path, headers, body, context):
+        if method == "GET" and path == "/ping":
+            return HTTPStatus.OK, b'{"status": "ok"}'
+        if path != self.path:
+            return HTTPStatus.NOT_FOUND, b""
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, b""
+        if body is None:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, b""
+        if self.in_flight >= self.slots or self.closing:
+            return HTTPStatus.SERVICE_UNAVAILABLE, b""
+
+        self._begin()
+        try:
+            return await self.dispatch(headers, body, context)
+        finally:
+            # the request stays in flight until after_response has run
+            # the work it deferred
+            if not context.callbacks:
+                self._end()
+
+    async def after_response(self, context):
+        """
+        Run the work the handler passed to context.after_response, once
+        the response has been written, on the handler threads.
+        """
+        if not context.callbacks:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, context.run_callbacks)
+        finally:
+            self._end()
+
+    def _begin(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def _end(self):
+        self.in_flight -= 1
+        if not self.in_flight:
+            self._idle.set()
+
+    async def dispatch(self, headers, body, context):
+        text = body.decode("utf-8")
+        try:
+            event = json.loads(text)
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, b""
+        loop = asyncio.get_running_loop()
+        try:
+            if self.verifiers:
+                await loop.run_in_executor(
+                    self.executor, self.verify, headers, text)
+            response = await loop.run_in_executor(
+                self.executor, self.handler, event, context)
+        except RequestRejected as e:
+            logger.warning("Rejected request: {}".format(e))
+            return HTTPStatus.BAD_REQUEST, b""
+        except Exception:
+            logger.error("Request failed", exc_info=True)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, b""
+        return HTTPStatus.OK, json.dumps(response).encode("utf-8")
+
+    def verify(self, headers, text):
+        from ask_sdk_core.serialize import DefaultSerializer
+        from ask_sdk_model import RequestEnvelope
+        try:
+            envelope = DefaultSerializer().deserialize(text, RequestEnvelope)
+            # the verifiers look headers up by their canonical names
+            headers = {name: value for name, value in headers.raw}
+            for verifier in self.verifiers:
+                verifier.verify(
+                    headers=headers, serialized_request_env=text,
+                    deserialized_request_env=envelope)
+        except Exception as e:
+            raise RequestRejected(str(e))
+
+
+class Headers(dict):
+    """
+    Header values by lower-case name, with the names as received in raw.
+    """
+
+    def __init__(self):
+        super(Headers, self).__init__()
+        self.raw = []
+
+    def add(self, name, value):
+        self.raw.append((name, value))
+        self[name.lower()] = value
+
+
+async def read_request(reader):
+    """
+    Read one HTTP/1.x request. Returns None at end of stream, and a None
+    body when the body is larger than MAX_BODY.
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, path, version = line.decode("latin-1").split()
+    headers = Headers()
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers.add(name.strip(), value.strip())
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY:
+        return method, path, version, headers, None
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], version, headers, body
+
+
+def write_response(writer, status, payload, keep_alive):
+    writer.write((
+        "HTTP/1.1 {} {}\r\n"
+        "Content-Type: application/json;charset=UTF-8\r\n"
+        "Content-Length: {}\r\n"
+        "Connection: {}\r\n\r\n").format(
+            status.value, status.phrase, len(payload),
+            "keep-alive" if keep_alive else "close").encode("latin-1"))
+    writer.write(payload)
+
+
+def build_verifiers(verify):
+    if not verify:
+        return []
+    from ask_sdk_webservice_support.verifier import (
+        RequestVerifier, TimestampVerifier)
+    return [RequestVerifier(), TimestampVerifier()]
+
+
+def run_worker(sock, args):
+    """
+    Serve on sock until SIGTERM / SIGINT, then shut down gracefully.
+    """
+    from lambda_function import lambda_handler
+
+    server = SkillServer(
+        lambda_handler, threads=args.threads, backlog=args.backlog,
+        verifiers=build_verifiers(args.verify), path=args.path)
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        await server.start(sock=sock)
+        await stop.wait()
+        # shutdown is bounded by grace, repeated signals don't cut it short
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(signum)
+            signal.signal(signum, signal.SIG_IGN)
+        await server.shutdown(args.grace)
+
+    asyncio.run(main())
+
+
+def prefork(sock, args):
+    """
+    Run args.workers worker processes on the shared socket, restarting
+    any that die, until SIGTERM / SIGINT is forwarded to them all.
+    """
+    children = {}
+    stopping = []
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(sock, args)
+            except Exception:
+                logger.error("Worker failed", exc_info=True)
+                code = 1
+            os._exit(code)
+        children[pid] = True
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        spawn()
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.pop(pid, None)
+        if not stopping:
+            logger.warning("Worker {} exited ({}), restarting".format(
+                pid, status))
+            spawn()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="pre-forked processes, e.g. one per core")
+    parser.add_argument("--threads", type=int, default=8,
+                        help="handler threads per process")
+    parser.add_argument("--backlog", type=int, default=32,
+                        help="requests allowed to wait for a thread")
+    parser.add_argument("--grace", type=float, default=REQUEST_TIMEOUT,
+                        help="seconds to finish requests on shutdown")
+    parser.add_argument("--no-verify", dest="verify", action="store_false")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(process)d %(message)s")
+    logger.setLevel(logging.INFO)
+
+    # import once in the parent so the workers share the loaded modules;
+    # storage and HTTP clients are created lazily, after the fork
+    import lambda_function  # noqa: F401
+    build_verifiers(args.verify)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.setblocking(False)
+
+    if args.workers > 1:
+        prefork(sock, args)
+    else:
+        run_worker(sock, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# Property checks for alexa.countdown against the computation the
+# HasBirthdayLaunchRequestHandler used before it (calendar.month_abbr and
+# datetime arithmetic), over random and exhaustive inputs.
+#
+# Usage, from the i18n directory:
+#   python -m pytest tests
+
+import calendar
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from alexa import countdown
+
+SEED = 20200301
+CASES = 20000
+
+
+def reference(year, month, day, today):
+    """
+    The handler's original countdown. Raises ValueError for Feb 29 in
+    non-leap years.
+    """
+    now_date = datetime(today.year, today.month, today.day)
+    current_year = today.year
+    month_as_index = list(calendar.month_abbr).index(month[:3].title())
+    next_birthday = datetime(current_year, month_as_index, day)
+    if now_date > next_birthday:
+        next_birthday = datetime(current_year + 1, month_as_index, day)
+        current_year += 1
+    return abs((now_date - next_birthday).days), current_year - year
+
+
+def random_date(rng, first=date(1900, 1, 1), last=date(2100, 12, 31)):
+    return first + timedelta(days=rng.randrange((last - first).days + 1))
+
+
+def check_against_reference(birth, today):
+    month = calendar.month_name[birth.month]
+    try:
+        expected = reference(birth.year, month, birth.day, today)
+    except ValueError:
+        # the old code crashed on Feb 29 birthdays in non-leap years
+        assert (birth.month, birth.day) == (2, 29)
+        return
+    assert countdown.days_until_birthday(
+        birth.year, countdown.month_number(month), birth.day, today) \
+        == expected
+
+
+def test_random_dates_match_reference():
+    rng = random.Random(SEED)
+    for _ in range(CASES):
+        check_against_reference(random_date(rng), random_date(rng))
+
+
+@pytest.mark.parametrize("year", [2023, 2024, 2100])
+def test_every_birthday_on_every_day_of_the_year(year):
+    # common year, leap year and a century that isn't a leap year
+    days = [date(year, 1, 1) + timedelta(days=n)
+            for n in range(366 if calendar.isleap(year) else 365)]
+    for birth in [date(2000, 1, 1) + timedelta(days=n) for n in range(366)]:
+        for today in days:
+            check_against_reference(birth, today)
+
+
+def test_result_is_a_valid_countdown():
+    rng = random.Random(SEED + 1)
+    for _ in range(CASES):
+        birth, today = random_date(rng), random_date(rng)
+        days, age = countdown.days_until_birthday(
+            birth.year, birth.month, birth.day, today)
+        assert 0 <= days <= 365
+        target = today + timedelta(days=days)
+        assert age == target.year - birth.year
+        if (birth.month, birth.day) == (2, 29) and \
+                not calendar.isleap(target.year):
+            assert (target.month, target.day) == (2, 28)
+        else:
+            assert (target.month, target.day) == (birth.month, birth.day)
+
+
+@pytest.mark.parametrize("today, expected", [
+    (date(2023, 2, 27), (1, 23)),
+    (date(2023, 2, 28), (0, 23)),
+    (date(2023, 3, 1), (365, 24)),
+    (date(2024, 2, 28), (1, 24)),
+    (date(2024, 2, 29), (0, 24)),
+    (date(2024, 3, 1), (364, 25)),
+    (date(2099, 12, 31), (59, 100)),
+    (date(2100, 3, 1), (364, 101)),
+])
+def test_leap_day_birthdays_fall_on_feb_28_in_common_years(today, expected):
+    assert countdown.days_until_birthday(2000, 2, 29, today) == expected
+
+
+@pytest.mark.parametrize("month, day", [(2, 30), (4, 31), (0, 1), (13, 1),
+                                        (1, 0), (1, 32)])
+def test_invalid_birthdays_are_rejected(month, day):
+    with pytest.raises(ValueError):
+        countdown.days_until_birthday(2000, month, day, date(2024, 1, 1))
+
+
+def test_english_names_match_month_abbr():
+    # every spelling the old .index(month[:3].title()) lookup accepted
+    for index in range(1, 13):
+        name = calendar.month_name[index]
+        for spelling in (name, name.lower(), name.upper(), name[:3],
+                         name[:3].lower(), name[:4]):
+            assert countdown.month_number(spelling) == index
+
+
+@pytest.mark.parametrize("language", sorted(countdown.MONTH_NAMES))
+def test_localized_month_names(language):
+    for index, name in enumerate(countdown.MONTH_NAMES[language], 1):
+        assert countdown.month_number(name) == index
+        assert countdown.month_number(name.upper()) == index
+        assert countdown.month_number(" {}. ".format(name)) == index
+
+
+@pytest.mark.parametrize("spelling, index", [
+    ("fevrier", 2), ("Août", 8), ("aout", 8), ("marco", 3),
+    ("März", 3), ("Sept", 9), ("Jänner", 1), ("setiembre", 9),
+    ("फरवरी", 2), ("सितम्बर", 9), ("3", 3), ("03", 3), ("12月", 12),
+    ("十二月", 12), ("१२", 12), ("déc", 12), ("févr", 2),
+])
+def test_month_spellings(spelling, index):
+    assert countdown.month_number(spelling) == index
+
+
+@pytest.mark.parametrize("name", ["jui", "ma", "", "13", "smarch"])
+def test_unknown_or_ambiguous_months_are_rejected(name):
+    # "jui" is juin or juillet, "ma" too short to tell
+    with pytest.raises(ValueError):
+        countdown.month_number(name)
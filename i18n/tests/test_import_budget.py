@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+# Cold-start regression check: the Lambda module must import within
+# IMPORT_BUDGET_MS (median of a few fresh interpreters) and must not pull
+# in the dependencies that are deferred to first use. See
+# benchmarks/bench_imports.py for the detailed report.
+#
+# Usage, from the i18n directory:
+#   python -m pytest tests/test_import_budget.py
+#   IMPORT_BUDGET_MS=150 python -m pytest tests/test_import_budget.py
+
+import os
+import statistics
+
+import pytest
+
+from benchmarks.bench_imports import DEFERRED, IMPORT_BUDGET_MS, import_times
+
+MODULE = "lambda_function"
+PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+
+
+@pytest.fixture(scope="module")
+def runs():
+    return [import_times(MODULE, PATH) for _ in range(RUNS)]
+
+
+def test_import_time_within_budget(runs):
+    totals = [dict((name, cumulative) for name, _, cumulative in run)
+              [MODULE] / 1000.0 for run in runs]
+    median = statistics.median(totals)
+    assert median <= IMPORT_BUDGET_MS, \
+        "{} imports in {:.1f} ms, budget {:.1f} ms".format(
+            MODULE, median, IMPORT_BUDGET_MS)
+
+
+@pytest.mark.parametrize("dependency", DEFERRED)
+def test_deferred_dependency_not_imported(runs, dependency):
+    imported = {name.split(".")[0] for run in runs for name, _, _ in run}
+    assert dependency not in imported
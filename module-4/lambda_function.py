@@ -11,6 +11,8 @@ import requests
 import calendar
 from datetime import datetime
 from pytz import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from ask_sdk_s3.adapter import S3Adapter
 s3_adapter = S3Adapter(bucket_name=os.environ["S3_PERSISTENCE_BUCKET"])
 
@@ -24,6 +26,22 @@ from ask_sdk_model import Response
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# (connect, read) timeouts in seconds for Alexa Settings API calls
+SETTINGS_API_TIMEOUT = (
+    float(os.environ.get("SETTINGS_API_CONNECT_TIMEOUT", "1.0")),
+    float(os.environ.get("SETTINGS_API_READ_TIMEOUT", "2.0")),
+)
+
+# shared session so TCP/TLS connections to the Alexa API are kept alive
+# across warm invocations, with retries and backoff for transient failures
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=10,
+    max_retries=Retry(
+        total=int(os.environ.get("SETTINGS_API_RETRIES", "2")),
+        backoff_factor=float(os.environ.get("SETTINGS_API_BACKOFF", "0.1")),
+        status_forcelist=(429, 500, 502, 503, 504))))
+
 
 class LaunchRequestHandler(AbstractRequestHandler):
     """Handler for Skill Launch."""
@@ -74,7 +92,8 @@ class HasBirthdayLaunchRequestHandler(AbstractRequestHandler):
 
         userTimeZone = ""
         try:
-	        r = requests.get(url, headers=headers)
+	        r = http_session.get(url, headers=headers, timeout=SETTINGS_API_TIMEOUT)
+	        r.raise_for_status()
 	        res = r.json()
 	        logger.info("Device API result: {}".format(str(res)))
 	        userTimeZone = res